@@ -1,19 +1,22 @@
+import asyncio
 import json
 import os
-import random
+import shutil
 import tempfile
 from io import BytesIO
-from mcp.server.fastmcp import FastMCP
-from PIL import Image
 
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
+register_job_tools(mcp)
 
 
 @mcp.tool()
+@run_in_thread
 def get_3dx_parameters(model_id: str) -> str:
   """Retrieves parameters for a 3DExperience/3DX/CATIA model with the specified model ID.
 
@@ -31,6 +34,7 @@ def get_3dx_parameters(model_id: str) -> str:
 
 
 @mcp.tool()
+@run_in_thread
 def get_3dx_components(model_id: str) -> str:
   """Retrieves information about components such as:
      * Material
@@ -54,88 +58,107 @@ def get_3dx_components(model_id: str) -> str:
 
 
 @mcp.tool()
-def extract_3dx_model_artifacts(model_id: str) -> str:
+async def extract_3dx_model_artifacts(model_id: str,
+                                      wait: bool = True) -> str:
   """Extracts artifacts from a 3DExperience/3DX/CATIA model with the specified ID.
 
      Args:
        model_id (str): A string containing the ID of the model for which parameters will be retrieved.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
   print('Submitting job to extract 3DX model requirements ...')
 
-  job = submit_job(model_id = model_id,
-                   function = '@istari:extract',
-                   tool_name = CAD_TOOL_NAME)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:extract',
+                                tool_name = CAD_TOOL_NAME)
   print(f"Job submitted with ID: {job.id}")
 
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait)
 
 
 @mcp.tool()
-def extract_3dx_model_parameters(model_id: str,
-                                 full_extract: bool) -> str:
+async def extract_3dx_model_parameters(model_id: str,
+                                       full_extract: bool,
+                                       wait: bool = True) -> str:
   """Extracts parameters from a 3DExperience/3DX/CATIA model with the specified ID.
 
      Args:
        model_id (str): A string containing the ID of the model for which parameters will be retrieved.
        full_extract (bool): If True, all model parameters will be extracted. Otherwise, only user parameters will be extracted.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
   print('Submitting job to extract 3DX model requirements ...')
 
-  input_file = 'input.json'
-  with open(input_file, 'w') as fout:
-    fout.write(f"{{\"full_extract\": {str(full_extract).lower()}}}")
+  input_file = write_params_file({"full_extract": full_extract})
 
-  job = submit_job(model_id = model_id,
-                   function = '@istari:extract_parameters',
-                   tool_name = CAD_TOOL_NAME,
-                   params_file = input_file)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:extract_parameters',
+                                tool_name = CAD_TOOL_NAME,
+                                params_file = input_file)
   print(f"Job submitted with ID: {job.id}")
 
-  os.remove(input_file)
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  remove_params_file(input_file)
+  return await complete_job_async(job,
+                                  wait)
 
 
 @mcp.tool()
-def update_3dx_model_parameters(model_id: str,
-                                params: dict[str, str]) -> None:
+async def update_3dx_model_parameters(model_id: str,
+                                      params: dict[str, str],
+                                      wait: bool = True) -> str:
   """Updates parameters in the specified 3DExperience/3DX/CATIA model with the specified ID.
 
      Args:
        model_id (str): A string containing the ID of the model for which parameters will be retrieved.
        params (dict[str, str]): A dictionary containing keys with the parameter names and values with the desired parameter value.  Parameter values should include units. Actual parameter names must be used.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
   print ('Submitting job to update 3DX model parameters ...')
 
   #params = params.replace('\\', '\\\\')
   input_json = {'parameters': params} #json.loads(params)}
-  input_file = 'input.json'
-  with open(input_file, 'w') as fout:
-    json.dump(input_json,
-              fout)
-
-  job = submit_job(model_id = model_id,
-                   function = '@istari:update_parameters',
-                   tool_name = CAD_TOOL_NAME,
-                   params_file = input_file)
+  input_file = write_params_file(input_json)
+
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:update_parameters',
+                                tool_name = CAD_TOOL_NAME,
+                                params_file = input_file)
   print(f"Job submitted with ID: {job.id}")
 
-  os.remove(input_file)
-  job = wait_for_job(job)
+  remove_params_file(input_file)
+
+  def update_model_version(job: "Job") -> None:
+    if str(job.status.name).find('COMPLETE') < 0:
+      return
 
-  client = get_client()
-  mod = client.get_model(model_id);
-  with open(mod.name, 'wb') as fout:
-    fout.write(mod.file.revisions[0].read_bytes())
+    # Each call gets its own directory, so concurrent updates of the same
+    # model never write the same file
+    client = get_client()
+    mod = client.get_model(model_id);
+    mod_dir = tempfile.mkdtemp()
+    try:
+      mod_file = os.path.join(mod_dir,
+                              mod.name)
+      with open(mod_file, 'wb') as fout:
+        fout.write(mod.file.revisions[0].read_bytes())
 
-  client.update_model(model_id,
-                      mod.name)
+      update_model_file(model_id,
+                        mod_file)
+    finally:
+      shutil.rmtree(mod_dir,
+                    ignore_errors = True)
 
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait,
+                                  update_model_version)
 
 
 @mcp.tool()
+@run_in_thread
 def view_3dx_model(model_id: str,
                    view: str) -> str:
   """Displays images of various views of a 3DExperience/3DX model.
@@ -157,6 +180,7 @@ def view_3dx_model(model_id: str,
     art_name = f"{view}_view.bmp"
     img_data = download_artifact_data(model_id,
                                       art_name)
+    from PIL import Image
     byte_data = BytesIO(img_data)
     img = Image.open(byte_data)
     img.show()
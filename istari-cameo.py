@@ -1,19 +1,18 @@
-import json
+import asyncio
 import os
-import random
-import tempfile
-from io import BytesIO
-from mcp.server.fastmcp import FastMCP
-from PIL import Image
 
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
+register_job_tools(mcp)
 
 
 @mcp.tool()
+@run_in_thread
 def get_cameo_requirements(model_id: str) -> str:
   """Retrieves requirements for Cameo model with the specified model ID.
 
@@ -31,21 +30,24 @@ def get_cameo_requirements(model_id: str) -> str:
 
 
 @mcp.tool()
-def extract_cameo_model_artifacts(model_id: str) -> str:
+async def extract_cameo_model_artifacts(model_id: str,
+                                        wait: bool = True) -> str:
   """Extracts artifacts from a Cameo model with the specified ID.
 
      Args:
        model_id (str): A string containing the ID of the model for which parameters will be retrieved.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
   print('Submitting job to extract Cameo model requirements ...')
-  job = submit_job(model_id = model_id,
-                   function = '@istari:extract',
-                   tool_name = CAMEO_TOOL_NAME,
-                   tool_ver = CAMEO_VERSION)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:extract',
+                                tool_name = CAMEO_TOOL_NAME,
+                                tool_ver = CAMEO_VERSION)
   print(f"Job submitted with ID: {job.id}")
 
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait)
 
 
 
@@ -8,27 +8,92 @@ SERVICE_SECRET = <YOUR_SERVICE_SECRET>
 
 A service secret can be generated from 3DX Platform Manager ->
 3D Passport Control Center -> Integration -> Batch Services
+
+The following optional settings tune the connection to 3DSpace:
+
+ENOVIA_POOL_SIZE = <MAX_CONNECTIONS_PER_HOST> (default 10)
+ENOVIA_MAX_WORKERS = <MAX_CONCURRENT_REQUESTS> (default 4)
+ENOVIA_KEEPALIVE_IDLE = <SECONDS_BEFORE_TCP_KEEPALIVE_PROBES> (default 60)
+ENOVIA_PAGE_SIZE = <SEARCH_RESULTS_PER_REQUEST> (default 100)
+
+Engineering items, issues and document file lists are cached in memory. The
+cache lifetimes (in seconds, 0 disables caching) and size can be set with:
+
+ENOVIA_ITEM_CACHE_TTL = <SECONDS> (default 300)
+ENOVIA_ISSUE_CACHE_TTL = <SECONDS> (default 60)
+ENOVIA_FILES_CACHE_TTL = <SECONDS> (default 300)
+ENOVIA_CACHE_SIZE = <MAX_ENTRIES_PER_ENDPOINT> (default 1000)
 """
 import json
 import os
 import requests
+import socket
+import sys
+import threading
 import urllib.parse
-from mcp.server.fastmcp import FastMCP
-
-from istari_digital_client.models.tracked_file_specifier_type import TrackedFileSpecifierType
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 
+from shared.artifact_cache import write_chunks
+from shared.ttl_cache import TTLCache
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
 ec = None
+_ec_lock = threading.Lock()
+SUMMARY_FIELDS = ["id", "name", "title", "description", "type", "revision", "state", "owner", "modified"]
+
+class KeepAliveAdapter(HTTPAdapter):
+  """
+  HTTPAdapter whose pooled connections enable TCP keep-alive probes, so idle
+  connections to 3DSpace are kept open (and dead ones detected) between
+  bursts of requests instead of being dropped by intermediate proxies.
+  """
+
+  def __init__(self,
+               keepalive_idle: int,
+               **kwargs):
+    self.keepalive_idle = keepalive_idle
+    super().__init__(**kwargs)
+
+
+  def init_poolmanager(self, *args, **kwargs):
+    socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+      socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+    kwargs['socket_options'] = socket_options
+    super().init_poolmanager(*args, **kwargs)
+
 
 class EnoviaConnector:
 
   def __init__(self):
     dotenv.load_dotenv(dotenv_path='enovia.env',override=True)
     self.BASE_URL = self._get_env_var('BASE_URL')
+    self.POOL_SIZE = int(os.getenv('ENOVIA_POOL_SIZE', '10'))
+    self.MAX_WORKERS = int(os.getenv('ENOVIA_MAX_WORKERS', '4'))
+    self.KEEPALIVE_IDLE = int(os.getenv('ENOVIA_KEEPALIVE_IDLE', '60'))
+    self.PAGE_SIZE = int(os.getenv('ENOVIA_PAGE_SIZE', '100'))
+    cache_size = int(os.getenv('ENOVIA_CACHE_SIZE', '1000'))
+    self.item_cache = TTLCache(float(os.getenv('ENOVIA_ITEM_CACHE_TTL', '300')),
+                               cache_size)
+    self.issue_cache = TTLCache(float(os.getenv('ENOVIA_ISSUE_CACHE_TTL', '60')),
+                                cache_size)
+    self.files_cache = TTLCache(float(os.getenv('ENOVIA_FILES_CACHE_TTL', '300')),
+                                cache_size)
+    # Bounds the number of concurrent 3DSpace requests issued by fan-out calls
+    self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+    self.tgt = None
+    self.session_generation = 0
+    self._session_lock = threading.Lock()
+    self._csrf_tokens = {}
+    self._csrf_doc_locks = {}
+    self._csrf_lock = threading.Lock()
 
 
   def get_standard_header(self) -> dict[str, str]:
@@ -62,38 +127,27 @@ class EnoviaConnector:
 
 
   def start_session(self):
-    # Get TGT (Ticket Granting Ticket)
-    SERVICE_NAME = self._get_env_var("SERVICE_NAME")
-    SERVICE_SECRET = self._get_env_var("SERVICE_SECRET")
-    headers = {
-        "DS-SERVICE-NAME": SERVICE_NAME,
-        "DS-SERVICE-SECRET": SERVICE_SECRET,
-    }
-
-    USERNAME = self._get_env_var("ENOVIA_USER")
     self.SSL_VERIFY = os.getenv("SSL_VERIFY")
     if self.SSL_VERIFY is None: self.SSL_VERIFY = True
     else: self.SSL_VERIFY = self.SSL_VERIFY.lower() != 'false'
 
-    url = f"{self.get_3dpassport_url()}/api/v2/batch/ticket?identifier={USERNAME}&service={urllib.parse.quote(self.BASE_URL + '/3dspace/')}"
-    response = requests.get(url, 
-                            headers=headers,
-                            verify=self.SSL_VERIFY)
-    tgt = response.json()["access_token"]
-    print(f"TGT Access Token: {tgt}")
+    self.session = self._create_session()
+    self._authenticate()
 
 
-    # Get ST (Service Ticket) from TGT
-    url = f"{self.get_3dpassport_url()}/api/login/cas/transient?tgt={tgt}&service={urllib.parse.quote(self.BASE_URL + '/3dspace/')}"
-    header = self.get_standard_header()
-    response = requests.get(url, 
-                            headers=header,
-                            verify=self.SSL_VERIFY)
-    st = response.json()["access_token"]
-    print(f"ST Access Token: {st}")
+  def _authenticate(self) -> None:
+    # Reuse the cached TGT when possible; a new one is only requested once
+    # 3DPassport stops issuing service tickets for it
+    st = None
+    if self.tgt is not None:
+      st = self._get_service_ticket()
+    if st is None:
+      self.tgt = self._get_ticket_granting_ticket()
+      st = self._get_service_ticket()
 
-    # Use ST to Authenticate Session
-    self.session = requests.Session()
+    # Use ST to Authenticate Session; CSRF tokens are tied to the session
+    self.session.cookies.clear()
+    self._csrf_tokens.clear()
     auth_response = self.session.get(f"{self.get_3dspace_url()}/?ticket={st}",
                                      verify=self.SSL_VERIFY)
 
@@ -105,7 +159,7 @@ class EnoviaConnector:
     }
     response = self.session.get(url, 
                                 params=params, 
-                                headers=header,
+                                headers=self.get_standard_header(),
                                 verify=self.SSL_VERIFY)
     response.raise_for_status()
     credentials = response.json()["preferredcredentials"]
@@ -113,142 +167,454 @@ class EnoviaConnector:
     organization = credentials["organization"]["name"]
     collabspace = credentials["collabspace"]["name"]
     self.security_context = f"{role}.{organization}.{collabspace}"
+    self.session_generation += 1
 
 
-  def get_engineering_item(self,
-                           item_id: str) -> None:
-    url = f"{self.get_engineering_url()}/dseng:EngItem/{item_id}"
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
+  def _get_ticket_granting_ticket(self) -> str:
+    SERVICE_NAME = self._get_env_var("SERVICE_NAME")
+    SERVICE_SECRET = self._get_env_var("SERVICE_SECRET")
+    headers = {
+        "DS-SERVICE-NAME": SERVICE_NAME,
+        "DS-SERVICE-SECRET": SERVICE_SECRET,
+    }
+
+    USERNAME = self._get_env_var("ENOVIA_USER")
+    url = f"{self.get_3dpassport_url()}/api/v2/batch/ticket?identifier={USERNAME}&service={urllib.parse.quote(self.BASE_URL + '/3dspace/')}"
+    response = requests.get(url, 
+                            headers=headers,
+                            verify=self.SSL_VERIFY)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+  def _get_service_ticket(self) -> str:
+    """
+    Returns a service ticket for 3DSpace issued from the cached TGT, or None if
+    3DPassport rejected the TGT.
+    """
+    url = f"{self.get_3dpassport_url()}/api/login/cas/transient?tgt={self.tgt}&service={urllib.parse.quote(self.BASE_URL + '/3dspace/')}"
+    response = requests.get(url, 
+                            headers=self.get_standard_header(),
                             verify=self.SSL_VERIFY)
-    print(json.dumps(resp.json(), indent=2))
+    if not response.ok:
+      return None
+
+    return response.json().get("access_token")
+
+
+  def _session_expired(self,
+                       resp: requests.Response) -> bool:
+    # An expired 3DSpace session is either rejected outright or redirected to
+    # the 3DPassport login page
+    return resp.status_code == 401 or \
+           resp.url.startswith(self.get_3dpassport_url())
+
+
+  def _renew_session(self,
+                     generation: int) -> None:
+    """
+    Re-authenticates the session unless another thread already renewed it
+    since the failed request (identified by its session generation) was sent.
+    """
+    with self._session_lock:
+      if self.session_generation == generation:
+        print('3DSpace session expired, re-authenticating ...',
+              file=sys.stderr)
+        self._authenticate()
+
+
+  def _request(self,
+               method: str,
+               url: str,
+               **kwargs) -> requests.Response:
+    """
+    Sends a request with the 3DSpace session. If the session has expired, it
+    is renewed and the request is retried once.
+    """
+    generation = self.session_generation
+    resp = self.session.request(method,
+                                url,
+                                **kwargs)
+    if self._session_expired(resp):
+      resp.close()
+      self._renew_session(generation)
+      headers = kwargs.get('headers')
+      if headers is not None and 'SecurityContext' in headers:
+        headers['SecurityContext'] = self.security_context
+      resp = self.session.request(method,
+                                  url,
+                                  **kwargs)
+
+    return resp
+
+
+  def get_engineering_item(self,
+                           item_id: str) -> object:
+    def fetch() -> object:
+      url = f"{self.get_engineering_url()}/dseng:EngItem/{item_id}"
+      resp = self._request('GET',
+                           url,
+                           headers=self.get_session_header(),
+                           verify=self.SSL_VERIFY)
+      resp.raise_for_status()
+      return resp.json()
+
+    return self.item_cache.get_or_fetch(item_id,
+                                        fetch)
 
 
   def find_engineering_items(self,
                              srch_str: str,
-                             max_items: int = 1) -> object:
+                             max_items: int = 1) -> list[dict[str, object]]:
     url = f"{self.get_engineering_url()}/dseng:EngItem/search"
-    params = {"$searchStr": srch_str, "$top": max_items}
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
-                            params=params,
-                            verify=self.SSL_VERIFY)
-    return resp.json()
+    return self._search(url,
+                        {"$searchStr": srch_str},
+                        max_items)
 
 
   def get_engineering_item_instances(self,
                                      item_id: str) -> object:
     url = f"{self.get_engineering_url()}/dseng:EngItem/{item_id}/dseng:EngInstance"
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
-                            verify=self.SSL_VERIFY)
-    return json.dumps(resp.json(), indent=2)
+    resp = self._request('GET',
+                         url,
+                         headers=self.get_session_header(),
+                         verify=self.SSL_VERIFY)
+    resp.raise_for_status()
+    return resp.json()
+
+
+  def get_engineering_items_instances(self,
+                                      item_ids: list[str]) -> dict[str, object]:
+    """
+    Gets the instances of several engineering items, fetching up to
+    MAX_WORKERS items at once.
+    """
+    item_ids = list(dict.fromkeys(item_ids))
+    return dict(zip(item_ids, self.executor.map(self.get_engineering_item_instances, item_ids)))
+
+
+  def expand_bom(self,
+                 item_id: str,
+                 depth: int = 0) -> dict[str, object]:
+    """
+    Expands the product structure below an engineering item breadth-first,
+    fetching the instances of each level concurrently. Sub-assemblies that
+    are used more than once are only expanded once.
+
+    Returns a flat list of instances, each recording its parent item, the
+    item it instantiates and its level below the root. A depth of 0 expands
+    the full structure. Items whose instances could not be read are listed in
+    'errors' and the result is marked as truncated.
+    """
+    def fetch(parent_id: str) -> tuple[object, str]:
+      try:
+        return self.get_engineering_item_instances(parent_id), None
+      except requests.RequestException as excp:
+        return None, str(excp)
+
+    instances = []
+    errors = []
+    expanded = {item_id}
+    level_ids = [item_id]
+    level = 0
+    while len(level_ids) > 0 and (depth <= 0 or level < depth):
+      level += 1
+      next_ids = []
+      for parent_id, (inst_json, error) in zip(level_ids, self.executor.map(fetch, level_ids)):
+        if error is not None:
+          errors.append({"item_id": parent_id,
+                         "error": error})
+          continue
+        for inst in inst_json.get('member', []):
+          child_id = inst.get('referencedObject', {}).get('identifier')
+          instances.append({"level": level,
+                            "parent_id": parent_id,
+                            "instance_id": inst.get('id'),
+                            "instance_name": inst.get('name'),
+                            "item_id": child_id})
+          if child_id is not None and child_id not in expanded:
+            expanded.add(child_id)
+            next_ids.append(child_id)
+      level_ids = next_ids
+
+    return {"root_id": item_id,
+            "levels": max((inst["level"] for inst in instances), default = 0),
+            "item_count": len(expanded),
+            "truncated": len(level_ids) > 0 or len(errors) > 0,
+            "instances": instances,
+            "errors": errors}
 
 
   def replace_engineering_instance(self,
                                    parent_id: str,
                                    component_id: str) -> str:
     url = f"{self.get_engineering_url()}/dseng:EngItem/{parent_id}/dseng:EngInstance/{component_id}/replace"
-    print(url)
-    resp = self.session.post(url,
-                             headers=self.get_session_header(),
-                             verify=self.SSL_VERIFY)
-    print(json.dumps(resp.json(), indent=2))
+    resp = self._request('POST',
+                         url,
+                         headers=self.get_session_header(),
+                         verify=self.SSL_VERIFY)
+    self.item_cache.invalidate(parent_id)
+    return json.dumps(resp.json(), indent=2)
 
 
   def get_item_documents(self,
                          item_id: str,
-                         rels: list[str] = ["Reference Document", "PLMDocConnection", "SpecificationDocument"]) -> list[dict[str, str]]:
-    docs = []
-    for rel in rels:
-      params = {
-                 "parentRelName": rel,
-                 "parentDirection": "from",
-                 "$include": "files,ownerInfo,parents",
-								 "$fields": "all"
-                }
-      url = f"{self.get_documents_url()}/parentId/{item_id}"
-      resp = self.session.get(url,
-                              params=params,
-                              headers=self.get_session_header(),
-                              verify=self.SSL_VERIFY)
-      docs.append(resp.json())
-
-    return docs
+                         rels: list[str] = ["Reference Document", "PLMDocConnection", "SpecificationDocument"]) -> list[dict[str, object]]:
+    return self.get_items_documents([item_id],
+                                    rels)[item_id]
+
+
+  def get_items_documents(self,
+                          item_ids: list[str],
+                          rels: list[str] = ["Reference Document", "PLMDocConnection", "SpecificationDocument"]) -> dict[str, list[dict[str, object]]]:
+    """
+    Gets the documents attached to several engineering items. The queries for
+    every (item, relationship) pair are sent concurrently, and a document
+    attached to an item through several relationships is returned once, with
+    the names of those relationships in its 'relationships' entry.
+    """
+    item_ids = list(dict.fromkeys(item_ids))
+    queries = [(item_id, rel) for item_id in item_ids for rel in rels]
+    results = self.executor.map(lambda query: self._get_related_documents(*query),
+                                queries)
+
+    item_docs = {item_id: {} for item_id in item_ids}
+    for (item_id, rel), docs in zip(queries, results):
+      for doc in docs:
+        doc_entry = item_docs[item_id].setdefault(doc.get('id'),
+                                                  dict(doc, relationships=[]))
+        doc_entry['relationships'].append(rel)
+
+    return {item_id: list(docs.values()) for item_id, docs in item_docs.items()}
+
+
+  def _get_related_documents(self,
+                             item_id: str,
+                             rel: str) -> list[dict[str, object]]:
+    params = {
+               "parentRelName": rel,
+               "parentDirection": "from",
+               "$include": "files,ownerInfo,parents",
+               "$fields": "all"
+              }
+    url = f"{self.get_documents_url()}/parentId/{item_id}"
+    resp = self._request('GET',
+                         url,
+                         params=params,
+                         headers=self.get_session_header(),
+                         verify=self.SSL_VERIFY)
+    resp.raise_for_status()
+    return resp.json().get('data', [])
 
 
   def find_documents(self,
                      srch_str: str,
-                     max_items: int = 1) -> object:
+                     max_items: int = 1) -> list[dict[str, object]]:
     url = f"{self.get_documents_url()}/search"
-    params = {"searchStr": srch_str, "$top": max_items}
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
-                            params=params,
-                            verify=self.SSL_VERIFY)
-    return resp.json()
+    return self._search(url,
+                        {"searchStr": srch_str},
+                        max_items)
 
 
   def find_issues(self,
                   srch_str: str,
-                  max_items: int = 1) -> object:
+                  max_items: int = 1) -> list[dict[str, object]]:
     url = f"{self.get_issues_url()}/search"
-    params = {"$searchStr": srch_str, "$top": max_items}
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
-                            params=params,
-                            verify=self.SSL_VERIFY)
-    return resp.json()
+    return self._search(url,
+                        {"$searchStr": srch_str},
+                        max_items)
 
 
   def get_issue(self,
                 issue_id: str) -> object:
-    url = f"{self.get_issues_url()}/{issue_id}"
-    params = {"$fields": "all"}
-    resp = self.session.get(url,
-                            headers=self.get_session_header(),
-                            params=params,
-                            verify=self.SSL_VERIFY)
-    return resp.json()
+    def fetch() -> object:
+      url = f"{self.get_issues_url()}/{issue_id}"
+      params = {"$fields": "all"}
+      resp = self._request('GET',
+                           url,
+                           headers=self.get_session_header(),
+                           params=params,
+                           verify=self.SSL_VERIFY)
+      resp.raise_for_status()
+      return resp.json()
+
+    return self.issue_cache.get_or_fetch(issue_id,
+                                         fetch)
 
 
   def get_document_files(self,
                          doc_id: str) -> object:
-    files_url = f"{self.get_documents_url()}/{doc_id}/files"
-    resp = self.session.get(files_url,
-                            headers=self.get_session_header(),
-                            verify=self.SSL_VERIFY)
-    resp.raise_for_status()
-    file_json = resp.json()
-    return file_json['data']
+    def fetch() -> object:
+      files_url = f"{self.get_documents_url()}/{doc_id}/files"
+      resp = self._request('GET',
+                           files_url,
+                           headers=self.get_session_header(),
+                           verify=self.SSL_VERIFY)
+      resp.raise_for_status()
+      file_json = resp.json()
+      return file_json['data']
+
+    return self.files_cache.get_or_fetch(doc_id,
+                                         fetch)
+
+
+  def clear_cache(self) -> None:
+    self.item_cache.clear()
+    self.issue_cache.clear()
+    self.files_cache.clear()
 
 
   def download_document_file(self,
                              doc_id: str,
                              file_id: str,
                              dest_file: str) -> None:
-    base_url = f"{self.get_documents_url()}/{doc_id}"
-    resp = self.session.get(base_url,
-                            headers=self.get_session_header(),
-                            verify=self.SSL_VERIFY)
-    csrf_tok = resp.json().get('csrf', {}).get('value', '')
+    download_url = self._get_download_url(doc_id,
+                                          file_id)
+    resp = self._request('GET',
+                         download_url,
+                         headers=self.get_session_header(),
+                         verify=self.SSL_VERIFY,
+                         allow_redirects=True,
+                         stream=True)
+    with resp:
+      resp.raise_for_status()
+      total = int(resp.headers.get('Content-Length', 0))
+      write_chunks(resp.iter_content(DOWNLOAD_CHUNK_SIZE),
+                   dest_file,
+                   total)
+
+
+  def download_document_files(self,
+                              files: list[dict[str, str]]) -> list[dict[str, str]]:
+    """
+    Downloads several document files concurrently. Each entry of files holds
+    the 'doc_id', 'file_id' and 'dest_file' of one download. A failed download
+    does not stop the others; the outcome of each one is reported in the
+    returned list, in the order of files.
+    """
+    def download(file: dict[str, str]) -> dict[str, str]:
+      result = dict(file)
+      try:
+        self.download_document_file(file['doc_id'],
+                                    file['file_id'],
+                                    file['dest_file'])
+        result['status'] = 'downloaded'
+      except Exception as excp:
+        result['status'] = 'failed'
+        result['error'] = str(excp)
+      return result
+
+    return list(self.executor.map(download, files))
+
+
+  def _get_csrf_token(self,
+                      doc_id: str) -> str:
+    """
+    Returns the CSRF token of a document, requesting it only once per document
+    even when several of its files are downloaded at the same time.
+    """
+    with self._csrf_lock:
+      doc_lock = self._csrf_doc_locks.setdefault(doc_id, threading.Lock())
+    with doc_lock:
+      csrf_tok = self._csrf_tokens.get(doc_id)
+      if csrf_tok is None:
+        resp = self._request('GET',
+                             f"{self.get_documents_url()}/{doc_id}",
+                             headers=self.get_session_header(),
+                             verify=self.SSL_VERIFY)
+        csrf_tok = resp.json().get('csrf', {}).get('value', '')
+        self._csrf_tokens[doc_id] = csrf_tok
+
+    return csrf_tok
+
+
+  def _get_download_url(self,
+                        doc_id: str,
+                        file_id: str) -> str:
+    ticket_url = f"{self.get_documents_url()}/{doc_id}/files/{file_id}/DownloadTicket"
+    for attempt in range(2):
+      header = self.get_session_header()
+      header['ENO_CSRF_TOKEN'] = self._get_csrf_token(doc_id)
+      resp = self._request('PUT',
+                           ticket_url,
+                           headers=header,
+                           verify=self.SSL_VERIFY)
+      if resp.status_code != 403 or attempt > 0:
+        break
+      # The cached token has expired, request a new one
+      self._csrf_tokens.pop(doc_id, None)
 
-    ticket_url = f"{base_url}/files/{file_id}/DownloadTicket"
-    header = self.get_session_header()
-    header['ENO_CSRF_TOKEN'] = csrf_tok
-    resp = self.session.put(ticket_url,
-                            headers=header,
-                            verify=self.SSL_VERIFY)
     resp.raise_for_status()
     download_json = resp.json()
-    download_url = download_json['data'][0]['dataelements']['ticketURL']
-    resp = self.session.get(download_url,
-                            headers=self.get_session_header(),
-                            verify=self.SSL_VERIFY,
-                            allow_redirects=True)
-    resp.raise_for_status()
-    with open(dest_file, 'wb') as fout:
-      fout.write(resp.content)
+    return download_json['data'][0]['dataelements']['ticketURL']
+
+
+  def _search(self,
+              url: str,
+              params: dict[str, str],
+              max_items: int) -> list[dict[str, object]]:
+    """
+    Runs a search and returns up to max_items matches (all matches if
+    max_items is 0), fetching PAGE_SIZE results per request with $skip/$top.
+
+    When the first page reports the total number of matches, the remaining
+    pages are fetched concurrently, stepping by the size of the first page
+    since 3DSpace may return fewer results per page than requested. If the
+    total is not reported, or a later page comes back shorter than expected,
+    the rest is fetched page by page until an empty page is returned.
+    """
+    def fetch(skip: int) -> list[dict[str, object]]:
+      page_params = dict(params)
+      page_params['$skip'] = skip
+      page_params['$top'] = self.PAGE_SIZE
+      if max_items > 0:
+        page_params['$top'] = min(self.PAGE_SIZE, max_items - skip)
+      resp = self._request('GET',
+                           url,
+                           headers=self.get_session_header(),
+                           params=page_params,
+                           verify=self.SSL_VERIFY)
+      resp.raise_for_status()
+      return resp.json()
+
+    page_json = fetch(0)
+    items = _search_items(page_json)
+    total = page_json.get('totalItems')
+    if total is not None and max_items > 0:
+      total = min(total, max_items)
+
+    step = len(items)
+    if total is not None and step > 0:
+      skips = list(range(step, total, step))
+      for skip, page_json in zip(skips, self.executor.map(fetch, skips)):
+        page_items = _search_items(page_json)
+        items.extend(page_items)
+        if len(page_items) < min(step, total - skip):
+          break
+
+    page_items = items
+    while len(page_items) > 0 and \
+          (total is None or len(items) < total) and \
+          (max_items <= 0 or len(items) < max_items):
+      page_items = _search_items(fetch(len(items)))
+      items.extend(page_items)
+
+    if max_items > 0:
+      items = items[:max_items]
+    return items
+
+
+  def _create_session(self) -> requests.Session:
+    session = requests.Session()
+    # One pool per host, sized so that every worker thread can hold its own
+    # connection without blocking or discarding connections
+    adapter = KeepAliveAdapter(self.KEEPALIVE_IDLE,
+                               pool_connections=self.POOL_SIZE,
+                               pool_maxsize=max(self.POOL_SIZE, self.MAX_WORKERS))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
 
 
   def _get_env_var(self,
@@ -260,7 +626,47 @@ class EnoviaConnector:
     return var_val
 
 
+def _search_items(page_json: dict) -> list[dict[str, object]]:
+  # Engineering item searches list their results under 'member', document and
+  # issue searches under 'data'
+  if 'member' in page_json:
+    return page_json['member']
+  return page_json.get('data', [])
+
+
+def summarize(items: list[dict[str, object]]) -> list[dict[str, object]]:
+  """
+  Reduces search results to their identifying fields (SUMMARY_FIELDS), so
+  large result sets fit in a single tool response.
+  """
+  summary = []
+  for itm in items:
+    fields = dict(itm)
+    fields.update(itm.get('dataelements', {}))
+    summary.append({key: fields[key] for key in SUMMARY_FIELDS if key in fields})
+
+  return summary
+
+
+def get_connector() -> EnoviaConnector:
+  """
+  Returns the Enovia connector, authenticating with 3DSpace on first use so
+  that servers hosting the Enovia tools start without waiting for it. This
+  runs inside a tool call, so nothing on this path may write to stdout (the
+  MCP stdio transport).
+  """
+  global ec
+  with _ec_lock:
+    if ec is None:
+      connector = EnoviaConnector()
+      connector.start_session()
+      ec = connector
+
+  return ec
+
+
 @mcp.tool()
+@run_in_thread
 def get_engineering_item(item_id: str) -> dict[str, str]:
   """Gets an Enovia engineering item with the specified ID.
 
@@ -270,23 +676,33 @@ def get_engineering_item(item_id: str) -> dict[str, str]:
 		 Returns:
        A dictionary with information about the engineering item such as name, ID, descriptions, etc.
   """
-  return ec.get_engineering_item(item_id)
+  return get_connector().get_engineering_item(item_id)
 
 
 @mcp.tool()
-def find_engineering_items(srch_str: str) -> list[dict[str, str]]:
+@run_in_thread
+def find_engineering_items(srch_str: str,
+                           max_items: int = 100,
+                           summary: bool = False) -> list[dict[str, object]]:
   """Finds all Enovia engineering items that match the specified search string.
 
 		 Args:
 			 srch_str (str): The string to use for matching product names
+			 max_items (int): The maximum number of matches to return. A value of 0 returns all matches.
+			 summary (bool): If True, only the ID, name, title, description, type, revision, state, owner and modification date of each match are returned.
 
 		 Returns:
        A list of engineering item dictionaries with information about the items such as name, ID, description, etc.
   """
-  return ec.find_engineering_items(srch_str, 
-                                   100)
+  items = get_connector().find_engineering_items(srch_str,
+                                                 max_items)
+  if summary:
+    items = summarize(items)
+
+  return items
 
 @mcp.tool()
+@run_in_thread
 def get_engineering_item_instances(item_id: str) -> list[dict[str, str]]:
   """Gets all instances (subassemblies, subcomponents, parts, etc.) of the specified engineering item.
 
@@ -296,10 +712,42 @@ def get_engineering_item_instances(item_id: str) -> list[dict[str, str]]:
      Returns:
        A list of engineering instance dictionaries with information about the instances such as name, ID, description, etc.
   """
-  return ec.get_engineering_item_instances(item_id)
+  return get_connector().get_engineering_item_instances(item_id)
+
+
+@mcp.tool()
+@run_in_thread
+def get_engineering_items_instances(item_ids: list[str]) -> dict[str, object]:
+  """Gets the instances (subassemblies, subcomponents, parts, etc.) of several engineering items at once.
+
+     Args:
+       item_ids (list[str]): The engineering item IDs to search
+
+     Returns:
+       A dictionary with the engineering item IDs as keys and the instances of each item as values.
+  """
+  return get_connector().get_engineering_items_instances(item_ids)
+
+
+@mcp.tool()
+@run_in_thread
+def expand_bom(item_id: str,
+               depth: int = 0) -> dict[str, object]:
+  """Expands the bill of materials (product structure) below an engineering item in a single call.
+
+     Args:
+       item_id (str): The engineering item ID of the root of the structure
+       depth (int): The number of levels to expand. A value of 0 expands the full structure.
+
+     Returns:
+       A dictionary with the number of levels and unique items found, whether the expansion is incomplete (stopped at the depth limit or failed for some items), a flat list of instances, each with its level, parent item ID, instance ID, instance name and the ID of the item it instantiates, and the IDs and error messages of items whose instances could not be read.
+  """
+  return get_connector().expand_bom(item_id,
+                                    depth)
 
 
 @mcp.tool()
+@run_in_thread
 def get_item_documents(item_id: str,
                        relationships: list[str] = ["Reference Document", "PLMDocConnection", "SpecificationDocument"]) -> list[dict[str, str]]:
   """Gets documents associated with an engineering item.
@@ -311,39 +759,75 @@ def get_item_documents(item_id: str,
      Return:
        A list of document dictionaries with information about the documents such as name, ID, description, etc.
   """
-  return ec.get_item_documents(item_id,
-                               relationships)
+  return get_connector().get_item_documents(item_id,
+                                            relationships)
+
+
+@mcp.tool()
+@run_in_thread
+def get_items_documents(item_ids: list[str],
+                        relationships: list[str] = ["Reference Document", "PLMDocConnection", "SpecificationDocument"]) -> dict[str, list[dict[str, object]]]:
+  """Gets the documents associated with several engineering items at once, e.g. all items of an assembly.
+
+     Args:
+       item_ids (list[str]): The engineering item IDs
+       relationships (list[str]): The types of relationships of the associated documents to search for
+
+     Return:
+       A dictionary with the engineering item IDs as keys and lists of document dictionaries as values. Each document is listed once per item, with the relationships it is attached through.
+  """
+  return get_connector().get_items_documents(item_ids,
+                                             relationships)
 
 
 @mcp.tool()
-def find_documents(srch_str: str) -> list[dict[str, str]]:
+@run_in_thread
+def find_documents(srch_str: str,
+                   max_items: int = 100,
+                   summary: bool = False) -> list[dict[str, object]]:
   """Finds all Enovia documents that match the specified search string.
 
 		 Args:
 			 srch_str (str): The string to use for matching documents
+			 max_items (int): The maximum number of matches to return. A value of 0 returns all matches.
+			 summary (bool): If True, only the ID, name, title, description, type, revision, state, owner and modification date of each match are returned.
 
 		 Returns:
        A list of document dictionaries with information about the documents such as name, ID, description, etc.
   """
-  return ec.find_documents(srch_str, 
-                           100)
+  items = get_connector().find_documents(srch_str,
+                                         max_items)
+  if summary:
+    items = summarize(items)
+
+  return items
 
 
 @mcp.tool()
-def find_issues(srch_str: str) -> list[dict[str, str]]:
+@run_in_thread
+def find_issues(srch_str: str,
+                max_items: int = 100,
+                summary: bool = False) -> list[dict[str, object]]:
   """Finds all Enovia issues that match the specified search string.
 
 		 Args:
 			 srch_str (str): The string to use for matching issues
+			 max_items (int): The maximum number of matches to return. A value of 0 returns all matches.
+			 summary (bool): If True, only the ID, name, title, description, type, revision, state, owner and modification date of each match are returned.
 
 		 Returns:
        A list of issue dictionaries with information about the issues such as name, ID, description, etc.
   """
-  return ec.find_issues(srch_str, 
-                        100)
+  items = get_connector().find_issues(srch_str,
+                                      max_items)
+  if summary:
+    items = summarize(items)
+
+  return items
 
 
 @mcp.tool()
+@run_in_thread
 def get_issue(issue_id: str) -> dict[str, str]:
   """Gets an Enovia issue with the specified ID.
 
@@ -353,10 +837,11 @@ def get_issue(issue_id: str) -> dict[str, str]:
 		 Returns:
        A dictionary containing information about the issue such as name, ID, description, etc.
   """
-  return ec.get_issue(issue_id)
+  return get_connector().get_issue(issue_id)
 
 
 @mcp.tool()
+@run_in_thread
 def get_document_files(doc_id: str) -> list[dict[str, str]]:
   """Gets the files associated with a document with the specified ID.
 
@@ -366,10 +851,11 @@ def get_document_files(doc_id: str) -> list[dict[str, str]]:
      Returns:
        A list of dictionaries containing information about the associated files such as name, ID, description, etc.
   """
-  return ec.get_document_files(doc_id)
+  return get_connector().get_document_files(doc_id)
 
 
 @mcp.tool()
+@run_in_thread
 def download_document_file(doc_id: str,
                            file_id: str,
                            dest_file: str) -> str:
@@ -380,14 +866,34 @@ def download_document_file(doc_id: str,
        file_id (str): The file ID
        dest_file (str): The path to the location to save the file
   """
-  ec.download_document_file(doc_id,
-                            file_id,
-                            dest_file)
-  print(f"Document file downloaded successfully")
+  get_connector().download_document_file(doc_id,
+                                         file_id,
+                                         dest_file)
+  return 'Document file downloaded successfully'
+
+
+@mcp.tool()
+@run_in_thread
+def download_document_files(files: list[dict[str, str]]) -> list[dict[str, str]]:
+  """Downloads several files referenced (attached) by documents at once.
+
+     Args:
+       files (list[dict[str, str]]): The files to download. Each entry must contain the 'doc_id' (document ID), 'file_id' (file ID) and 'dest_file' (path to the location to save the file).
+
+     Returns:
+       A list with the outcome of each download, in the same order as files. Each entry repeats the requested file and adds a 'status' of 'downloaded' or 'failed' and, for failed downloads, an 'error' message.
+  """
+  return get_connector().download_document_files(files)
+
+
+@mcp.tool()
+@run_in_thread
+def clear_enovia_cache() -> str:
+  """Clears the cached Enovia engineering items, issues and document file lists so that they are read again from 3DSpace."""
+  get_connector().clear_cache()
+  return 'Enovia cache cleared'
 
 
 if __name__ == "__main__":
-  ec = EnoviaConnector()
-  ec.start_session()
   print("MCP Server is running")
   mcp.run(transport='stdio')
@@ -1,18 +1,21 @@
+import asyncio
 import json
 import os
-import random
+import re
 import tempfile
-from io import BytesIO
-from mcp.server.fastmcp import FastMCP
-from PIL import Image
 
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
+register_job_tools(mcp)
+CELL_REF_RE = re.compile(r"(?:=?'?(?P<sheet>[^'!]+)'?!)?\$?(?P<column>[A-Za-z]{1,3})\$?(?P<row>[0-9]+)")
 
 @mcp.tool()
+@run_in_thread
 def get_named_cells(model_id: str) -> str:
   """Retrieves information about all of the named cells in an Excel model, including:
      * The sheet name on which the named cell is located
@@ -33,28 +36,32 @@ def get_named_cells(model_id: str) -> str:
 
 
 @mcp.tool()
-def extract_named_cells(model_id: str) -> str:
+async def extract_named_cells(model_id: str,
+                              wait: bool = True) -> str:
   """Extracts the named cells artifact from an Excel model.
 
      Args:
        model_id (str): A string containing the ID of the model from which the named cells will be extracted.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
 
-  job = submit_job(model_id = model_id,
-                   function = '@istari:extract',
-                   tool_name = EXCEL_TOOL_NAME)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:extract',
+                                tool_name = EXCEL_TOOL_NAME)
   print(f"Job submitted with ID: {job.id}")
 
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait)
 
 
 @mcp.tool()
-def update_cell_value(model_id: str,
-                      sheet_name: str,
-                      row_index: int,
-                      column_index: int,
-                      cell_value: str) -> str:
+async def update_cell_value(model_id: str,
+                            sheet_name: str,
+                            row_index: int,
+                            column_index: int,
+                            cell_value: str,
+                            wait: bool = True) -> str:
   """Updates the value of a cell with the specified name with the specified value in an Excel model.
      Note that the row and column indices must first be retrieved for named cells.
 
@@ -64,28 +71,146 @@ def update_cell_value(model_id: str,
        row_index (str): The 1-based index of the row of the cell to be updated.
        column_index (str): The 1-based index of the column of the cell to be updated.
        cell_value (str): The updated value of the cell.
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
   input_json = {"sheet_name": sheet_name,
                 "row": row_index,
                 "column": column_index,
                 "new_cell_value": cell_value}
 
-  input_file = 'input.json'
-  with open(input_file, 'w') as fout:
-    json.dump(input_json,
-              fout)
+  input_file = write_params_file(input_json)
 
-  job = submit_job(model_id = model_id,
-                   function = '@istari:update_cell',
-                   tool_name = EXCEL_TOOL_NAME,
-                   params_file = input_file)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:update_cell',
+                                tool_name = EXCEL_TOOL_NAME,
+                                params_file = input_file)
   print(f"Job submitted with ID: {job.id}")
 
-  os.remove(input_file)
-  job = wait_for_job(job)
-  
+  remove_params_file(input_file)
+
+  def update_model_version(job: "Job") -> str:
+    return upload_modified_workbook(model_id,
+                                    job)
+
+  return await complete_job_async(job,
+                                  wait,
+                                  update_model_version)
+
+
+@mcp.tool()
+async def update_cells(model_id: str,
+                       updates: list[dict[str, str | int | float]],
+                       wait: bool = True) -> str:
+  """Updates the values of several cells of an Excel model at once, producing a single new version of the model.
+     Use this instead of repeated calls to update_cell_value when more than one cell changes.
+
+     Args:
+       model_id (str): A string containing the ID of the model in which the cells will be updated.
+       updates (list[dict[str, str | int | float]]): The cell updates. Each update contains the 'cell_value' to set and identifies the cell either by its 'cell_name' (for named cells; requires the named cells artifact, see extract_named_cells) or by its 'sheet_name', 'row_index' and 'column_index' (1-based).
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
+  """
+  # Not every deployment of the Excel tool provides the batch function
+  if not await asyncio.to_thread(is_function_available,
+                                 '@istari:update_cells',
+                                 EXCEL_TOOL_NAME):
+    return 'The Excel tool does not provide @istari:update_cells. Update the cells one at a time with update_cell_value.'
+
+  # Named cells are resolved to sheet/row/column here, so the job only ever
+  # receives the same cell addresses as @istari:update_cell
+  named_cells = {}
+  if any('cell_name' in update for update in updates):
+    try:
+      nc_data = await asyncio.to_thread(download_artifact_data,
+                                        model_id,
+                                        NAMED_CELLS_FILE_NAME)
+    except FileNotFoundError:
+      return 'Named cells artifact not found. Extract named cells from the Excel model first.'
+    named_cells = parse_named_cells(nc_data)
+
+  cells = []
+  for update in updates:
+    if 'cell_value' not in update:
+      raise ValueError(f"Cell update is missing 'cell_value': {update}")
+
+    if 'cell_name' in update:
+      if update['cell_name'] not in named_cells:
+        raise ValueError(f"Named cell not found: {update['cell_name']}")
+      sheet_name, row_index, column_index = named_cells[update['cell_name']]
+      cells.append({"sheet_name": sheet_name,
+                    "row": row_index,
+                    "column": column_index,
+                    "new_cell_value": str(update['cell_value'])})
+    elif all(key in update for key in ['sheet_name', 'row_index', 'column_index']):
+      cells.append({"sheet_name": update['sheet_name'],
+                    "row": int(update['row_index']),
+                    "column": int(update['column_index']),
+                    "new_cell_value": str(update['cell_value'])})
+    else:
+      raise ValueError(f"Cell update must contain 'cell_name' or 'sheet_name', 'row_index' and 'column_index': {update}")
+
+  input_file = write_params_file({"cells": cells})
+
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:update_cells',
+                                tool_name = EXCEL_TOOL_NAME,
+                                params_file = input_file)
+  print(f"Job submitted with ID: {job.id}")
+
+  remove_params_file(input_file)
+
+  def update_model_version(job: "Job") -> str:
+    return upload_modified_workbook(model_id,
+                                    job)
+
+  return await complete_job_async(job,
+                                  wait,
+                                  update_model_version)
+
+
+def parse_named_cells(nc_data: bytes) -> dict[str, tuple[str, int, int]]:
+  """
+  Returns the (sheet name, 1-based row, 1-based column) of each single-cell
+  name in a named cells artifact, keyed by name.
+
+  The artifact lists the named cells either as a list of objects carrying
+  their name or as an object keyed by name. Each entry gives the cell in its
+  'Range' (e.g. "Sheet1!$B$3" or "$B$3") and, if the range does not include
+  it, the sheet in a 'Sheet'/'Sheet_Name' field (keys are matched case
+  insensitively). Names that refer to multi-cell ranges are skipped.
+  """
+  nc_json = json.loads(nc_data)
+  if isinstance(nc_json, dict):
+    entries = [dict(entry, name = name) for name, entry in nc_json.items() if isinstance(entry, dict)]
+  else:
+    entries = nc_json
+
+  named_cells = {}
+  for entry in entries:
+    entry = {key.lower(): val for key, val in entry.items()}
+    match = CELL_REF_RE.fullmatch(str(entry.get('range', '')).strip())
+    if entry.get('name') is None or match is None:
+      continue
+
+    sheet_name = match.group('sheet') or entry.get('sheet_name') or entry.get('sheet')
+    column_index = 0
+    for letter in match.group('column').upper():
+      column_index = column_index * 26 + ord(letter) - ord('A') + 1
+    named_cells[entry['name']] = (sheet_name,
+                                  int(match.group('row')),
+                                  column_index)
+
+  return named_cells
+
+
+def upload_modified_workbook(model_id: str,
+                             job: "Job") -> str:
+  """
+  Uploads the workbook modified by a completed cell update job as a new
+  version of the model.
+  """
   if str(job.status.name).find('COMPLETE') >= 0:
-    client = get_client()
     excl_mod_name = get_model_display_name(model_id)
     excl_file = os.path.join(tempfile.gettempdir(),
                              f"{excl_mod_name}.xlsx")
@@ -93,15 +218,13 @@ def update_cell_value(model_id: str,
                       MOD_WB_FILE_NAME,
                       excl_file)
     try: # BUG: This throws an exception for some reason
-      client.update_model(model_id,
-                          excl_file)
+      update_model_file(model_id,
+                        excl_file)
     except Exception as excp:
       return f"Exception thrown: {excp}"
 
     os.remove(excl_file)
 
-  return f"Job Complete [{job.status.name}]"
-
 
 if __name__ == "__main__":
   print("MCP Server is running")
@@ -1,20 +1,17 @@
-import json
 import os
-import random
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from mcp.server.fastmcp import FastMCP
-from PIL import Image
-from istari_digital_client.models import NewSnapshot, NewSystem, NewSystemConfiguration, NewTrackedFile, AccessRelationship, AccessRelation, AccessSubjectType, AccessResourceType
-from istari_digital_client.models.tracked_file_specifier_type import TrackedFileSpecifierType
 
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
 
 @mcp.tool()
+@run_in_thread
 def get_models() -> dict[str, dict[str, str]]:
   """Gets the UUIDs and associated metadata of all available models.
 
@@ -22,29 +19,23 @@ def get_models() -> dict[str, dict[str, str]]:
        A dictionary with keys containing model UUIDs and values containing model metadata.
   """
   client = get_client()
-  pg_idx = 1
-  mod_pg = client.list_models(pg_idx)
-
   mods = {}
-  while len(mod_pg.items) > 0:
-    for mod_itm in mod_pg.items:
-      mod_id = mod_itm.id
-      mod_rev = mod_itm.file.revisions[-1]
-      mods[mod_id] = {"name": mod_rev.name,
-                      "display_name": mod_rev.display_name,
-                      "revision_id": str(mod_rev.id),
-                      "creation_date": str(mod_rev.created),
-                      "extension": mod_rev.extension,
-                      "size": mod_rev.size,
-                      "sources": str(mod_rev.sources)}
-
-    pg_idx += 1
-    mod_pg = client.list_models(pg_idx)
+  for mod_itm in list_all_pages(client.list_models):
+    mod_id = mod_itm.id
+    mod_rev = mod_itm.file.revisions[-1]
+    mods[mod_id] = {"name": mod_rev.name,
+                    "display_name": mod_rev.display_name,
+                    "revision_id": str(mod_rev.id),
+                    "creation_date": str(mod_rev.created),
+                    "extension": mod_rev.extension,
+                    "size": mod_rev.size,
+                    "sources": str(mod_rev.sources)}
 
   return mods
 
 
 @mcp.tool()
+@run_in_thread
 def get_users() -> dict[str, dict[str, str]]:
   """Gets the UUIDs and associated metadata of all users.
 
@@ -66,6 +57,7 @@ def get_users() -> dict[str, dict[str, str]]:
 
 
 @mcp.tool()
+@run_in_thread
 def get_systems() -> dict[str, dict[str, str]]:
   """Gets the UUIDs and associated metadata of all available systems.
 
@@ -73,24 +65,18 @@ def get_systems() -> dict[str, dict[str, str]]:
        A dictionary with keys containing system UUIDs and values containing system metadata.
   """
   client = get_client()
-  pg_idx = 1
-  sys_pg = client.list_systems(pg_idx)
-
   systems = {}
-  while len(sys_pg.items) > 0:
-    for sys_itm in sys_pg.items:
-      sys_id = sys_itm.id
-      systems[sys_id] = {"name": sys_itm.name,
-                         "description": sys_itm.description,
-                         "creation_date": str(sys_itm.created)}
-
-    pg_idx += 1
-    sys_pg = client.list_systems(pg_idx)
+  for sys_itm in list_all_pages(client.list_systems):
+    sys_id = sys_itm.id
+    systems[sys_id] = {"name": sys_itm.name,
+                       "description": sys_itm.description,
+                       "creation_date": str(sys_itm.created)}
 
   return systems
 
 
 @mcp.tool()
+@run_in_thread
 def share_resource_with_user(resource_id: str,
                              user_id: str,
                              access_type: str,
@@ -118,6 +104,7 @@ def share_resource_with_user(resource_id: str,
 
 
 @mcp.tool()
+@run_in_thread
 def get_model_artifacts(model_id: str) -> dict[str, dict[str, str]]:
   """Gets the UUIDs and associated metadata of all artifacts produced by a specified model.
 
@@ -127,37 +114,57 @@ def get_model_artifacts(model_id: str) -> dict[str, dict[str, str]]:
      Returns:
        A dictionary with artifact UUIDs as keys and various artifact metadata in the values.
   """
-  client = get_client()
-  mod = client.get_model(model_id)
-  mod_rev = mod.file.revisions[-1]
+  mod_rev = get_latest_revision(model_id)
+  art_revs = get_model_artifact_revisions(model_id,
+                                          mod_rev.id)
+  if len(art_revs) == 0:
+    # The cached latest revision may be out of date; check it once
+    invalidate_latest_revision(model_id)
+    latest_rev = get_latest_revision(model_id)
+    if latest_rev.id != mod_rev.id:
+      mod_rev = latest_rev
+      art_revs = get_model_artifact_revisions(model_id,
+                                              mod_rev.id)
 
   arts = {}
-  pg_idx = 1
-  while True:
-    art_list = client.list_model_artifacts(model_id,
-                                           page = pg_idx)
-    art_items = art_list.items
-    if len(art_items) == 0:
-      break
-    
-    for art_itm in art_items:
-      art_rev = art_itm.file.revisions[-1]
-      for art_rev_src in art_rev.sources:
-        if mod_rev.id == art_rev_src.revision_id:
-          arts[art_itm.id] = {"name": art_itm.name,
-                              "display_name": art_rev.display_name,
-                              "revision_id": str(art_rev.id),
-                              "creation_date": str(art_rev.created),
-                              "extension": art_rev.extension,
-                              "size": art_rev.size,
-                              "sources": str(art_rev.sources)}
-
-    pg_idx += 1
+  for art_itm, art_rev in art_revs:
+    arts[art_itm.id] = {"name": art_itm.name,
+                        "display_name": art_rev.display_name,
+                        "revision_id": str(art_rev.id),
+                        "creation_date": str(art_rev.created),
+                        "extension": art_rev.extension,
+                        "size": art_rev.size,
+                        "sources": str(art_rev.sources)}
 
   return arts
 
 
 @mcp.tool()
+async def wait_for_model_updates(model_ids: list[str],
+                                 timeout: float = MODEL_WAIT_TIMEOUT) -> dict[str, str]:
+  """Waits until a new version of any of the specified models is uploaded and reports which model changed.
+
+     Args:
+       model_ids (list[str]): The UUIDs of the models to watch.
+       timeout (float): The maximum number of seconds to wait. A value of 0 waits until a model changes.
+
+     Returns:
+       A dictionary with the UUID of the changed model and its new revision.
+  """
+  try:
+    mod_id, mod_rev = await wait_for_model_update_async(model_ids,
+                                                        timeout)
+  except TimeoutError:
+    return {"message": f"No model changed within {timeout} seconds"}
+
+  return {"model_id": mod_id,
+          "revision_id": str(mod_rev.id),
+          "name": mod_rev.display_name,
+          "creation_date": str(mod_rev.created)}
+
+
+@mcp.tool()
+@run_in_thread
 def get_model_artifact(model_id: str,
                        artifact_name: str) -> bytes:
   return download_artifact_data(model_id,
@@ -165,6 +172,7 @@ def get_model_artifact(model_id: str,
 
 
 @mcp.tool()
+@run_in_thread
 def view_artifact(model_id: str,
                   artifact_name: str) -> str:
   """Displays an image artifact for the specified model.
@@ -177,6 +185,7 @@ def view_artifact(model_id: str,
   try:
     art_bytes = download_artifact_data(model_id,
                                        artifact_name)
+    from PIL import Image
     byte_data = BytesIO(art_bytes)
     img = Image.open(byte_data)
     img.show()
@@ -188,6 +197,7 @@ def view_artifact(model_id: str,
 
 
 @mcp.tool()
+@run_in_thread
 def get_system_model_ids(system_id: str,
                          snapshot_id: str = None) -> list[str]:
   """Gets the UUIDs of all models contained in a specified system.
@@ -202,22 +212,21 @@ def get_system_model_ids(system_id: str,
   client = get_client()
   sys = client.get_system(system_id)
 
-  model_ids = []
-  pg_idx = 1
-  snpsht_pg = sys.list_file_revisions_by_snapshot(page=pg_idx)
-  while len(snpsht_pg.items) > 0:
-    for snpsht_itm in snpsht_pg.items:
-      file = client.get_file(snpsht_itm.file_id)
-      if file.resource_type == 'Model':
-        model_ids.append(file.resource_id)
+  snpsht_itms = list_all_pages(sys.list_file_revisions_by_snapshot,
+                               snapshot = snapshot_id)
+  file_resources = get_file_resources([snpsht_itm.file_id for snpsht_itm in snpsht_itms])
 
-    pg_idx += 1
-    snpsht_pg = sys.list_file_revisions_by_snapshot(page=pg_idx)
+  model_ids = []
+  for snpsht_itm in snpsht_itms:
+    res_type, res_id = file_resources[snpsht_itm.file_id]
+    if res_type == 'Model':
+      model_ids.append(res_id)
 
   return model_ids
 
 
 @mcp.tool()
+@run_in_thread
 def get_system_snapshots(system_id: str) -> dict[str, dict[str, str]]:
   """Gets the snapshots associated with a specified system.
 
@@ -230,41 +239,43 @@ def get_system_snapshots(system_id: str) -> dict[str, dict[str, str]]:
   client = get_client()
   sys = client.get_system(system_id)
 
+  snpshts = list_all_pages(client.list_snapshots,
+                           system_id)
+  # Snapshots are listed concurrently but the pages of each snapshot are fetched
+  # in order, so the number of requests in flight never exceeds the
+  # connection pool size
+  max_workers = max(1, min(LOOKUP_WORKERS, REG_POOL_SIZE, len(snpshts)))
+  with ThreadPoolExecutor(max_workers = max_workers) as pool:
+    snpsht_itms = list(pool.map(lambda snpsht_sys: list_all_pages(client.list_snapshot_items,
+                                                                  snpsht_sys.id,
+                                                                  page_workers = 1),
+                                snpshts))
+
+  # Resolve every revision and user referenced by any snapshot in one batch
+  rev_ids = [snpsht_itm.file_revision_id
+             for itms in snpsht_itms
+             for snpsht_itm in itms]
+  rev_resources = get_revision_resources(rev_ids)
+  user_names = get_user_display_names([snpsht_sys.created_by_id for snpsht_sys in snpshts])
+
   sys_snpshts = {}
-  pg_idx = 1
-  snpsht_pg = client.list_snapshots(system_id,
-                                    page=pg_idx)
-  while len(snpsht_pg.items) > 0:
-    for snpsht_sys in snpsht_pg.items:
-      snpsht_mods = {}
-      snpsht_arts = {}
-      snpsht_mod_pg_idx = 1
-      snpsht_mod_pg = client.list_snapshot_items(snpsht_sys.id,
-                                                 snpsht_mod_pg_idx)
-      while len(snpsht_mod_pg.items) > 0:
-        for snpsht_itm in snpsht_mod_pg.items:
-          snpsht_itm_rev_id = snpsht_itm.file_revision_id
-          snpsht_file = client.get_file_by_revision_id(snpsht_itm_rev_id)
-          if snpsht_file.resource_type == "Model":
-            snpsht_mods[snpsht_file.resource_id] = snpsht_itm_rev_id
-
-        snpsht_mod_pg_idx += 1
-        snpsht_mod_pg = client.list_snapshot_items(snpsht_sys.id,
-                                                   snpsht_mod_pg_idx)
-
-      user_name = client.get_user_by_id(snpsht_sys.created_by_id).display_name
-      sys_snpshts[snpsht_sys.id] = {"creation_date": str(snpsht_sys.created),
-                                    "created_by": user_name,
-                                    "model_revisions": snpsht_mods}
-
-    pg_idx += 1
-    snpsht_pg = client.list_snapshots(system_id,
-                                      page=pg_idx)
+  for snpsht_sys, itms in zip(snpshts, snpsht_itms):
+    snpsht_mods = {}
+    for snpsht_itm in itms:
+      snpsht_itm_rev_id = snpsht_itm.file_revision_id
+      res_type, res_id = rev_resources[snpsht_itm_rev_id]
+      if res_type == "Model":
+        snpsht_mods[res_id] = snpsht_itm_rev_id
+
+    sys_snpshts[snpsht_sys.id] = {"creation_date": str(snpsht_sys.created),
+                                  "created_by": user_names[snpsht_sys.created_by_id],
+                                  "model_revisions": snpsht_mods}
 
   return sys_snpshts
 
 
 @mcp.tool()
+@run_in_thread
 def get_system_configurations(system_id: str) -> dict[str, dict[str, str]]:
   """Gets the configurations associated with a specified system.
 
@@ -278,16 +289,17 @@ def get_system_configurations(system_id: str) -> dict[str, dict[str, str]]:
   sys = client.get_system(system_id)
   cfgs = {}
 
+  user_names = get_user_display_names([sys_cfg.created_by_id for sys_cfg in sys.configurations])
   for sys_cfg in sys.configurations:
-    user_name = client.get_user_by_id(sys_cfg.created_by_id).display_name
     cfgs[sys_cfg.id] = {"name": sys_cfg.name,
                         "creation_date": sys_cfg.created,
-                        "created_by": user_name}
+                        "created_by": user_names[sys_cfg.created_by_id]}
 
   return cfgs
 
 
 @mcp.tool()
+@run_in_thread
 def create_system(name: str,
                   description: str,
                   model_ids: list[str] = None) -> str:
@@ -301,7 +313,10 @@ def create_system(name: str,
      Returns:
        The UUID of the newly created system.
   """
+  # get_client loads the registry client under its lock; import the models
+  # afterwards so the lazy module is never first loaded by two threads at once
   client = get_client()
+  from istari_digital_client.models import NewSystem, NewSystemConfiguration, NewTrackedFile, TrackedFileSpecifierType
   new_sys = NewSystem(name=name,
                       description=description)
   sys = client.create_system(new_sys)
@@ -321,6 +336,7 @@ def create_system(name: str,
 
 
 @mcp.tool()
+@run_in_thread
 def create_system_snapshot(system_id: str) -> str:
   """Creates a snapshot for the specified system.
 
@@ -328,6 +344,7 @@ def create_system_snapshot(system_id: str) -> str:
        system_id (str): The UUID of the system to add a snapshot to.
   """
   client = get_client()
+  from istari_digital_client.models import NewSnapshot
   sys = client.get_system(system_id)
   cfg_id = sys.configurations[-1].id
 
@@ -338,6 +355,7 @@ def create_system_snapshot(system_id: str) -> str:
 
 
 @mcp.tool()
+@run_in_thread
 def create_system_configuration(system_id: str,
                                 config_name: str,
                                 model_ids: list[str]) -> str:
@@ -352,6 +370,7 @@ def create_system_configuration(system_id: str,
        The UUID of the newly created configuration.
   """
   client = get_client()
+  from istari_digital_client.models import NewSystemConfiguration, NewTrackedFile, TrackedFileSpecifierType
   files = []
   if not model_ids == None and len(model_ids) > 0:
     for model_id in model_ids:
@@ -367,6 +386,7 @@ def create_system_configuration(system_id: str,
 
 
 @mcp.tool()
+@run_in_thread
 def update_model(model_id: str,
                  model_file: str) -> str:
   """Updates a model with a new version from the specified file.
@@ -375,16 +395,16 @@ def update_model(model_id: str,
        model_id (str): A string containing the ID of the model to update.
        model_file (str): The name of the file to upload as a new version of the model.
   """
-  client = get_client()
   disp_name,_ = os.path.splitext(os.path.basename(model_file))
-  client.update_model(model_id,
-                      model_file,
-                      display_name=disp_name)
+  update_model_file(model_id,
+                    model_file,
+                    display_name=disp_name)
 
   return 'Model updated successfully'
 
 
 @mcp.tool()
+@run_in_thread
 def upload_model(model_file: str,
                  model_id: str = None) -> str:
   """Pushes/Uploads a file to Istari as a new model or as an updated version.
@@ -397,8 +417,8 @@ def upload_model(model_file: str,
   if model_id is None or model_id == '':
     mod = client.add_model(model_file)
   else:
-    mod = client.update_model(model_id,
-                              model_file)
+    mod = update_model_file(model_id,
+                            model_file)
 
   return f"Model uploaded with UUID: {mod.id}"
 
@@ -408,6 +428,7 @@ def share_object(obj_id: str,
                  access_type: str,
                  resource_type: str) -> None:
   client = get_client()
+  from istari_digital_client.models import AccessRelationship, AccessRelation, AccessSubjectType, AccessResourceType
 
   access_type = access_type.lower()
   access = None
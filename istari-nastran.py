@@ -1,19 +1,18 @@
-import json
+import asyncio
 import os
-import random
-import tempfile
-from io import BytesIO
-from mcp.server.fastmcp import FastMCP
-from PIL import Image
 
 from shared.constants import *
 from shared.helpers import *
+from shared.async_helpers import *
+from shared.server import get_server
 
 
-mcp = FastMCP("istari-mcp-server")
+mcp = get_server()
+register_job_tools(mcp)
 
 
 @mcp.tool()
+@run_in_thread
 def get_nastran_results(model_id: str) -> str:
   """Retrieves Nastran simulation results data such as:
      * Displacements (Translations/Rotations)
@@ -35,6 +34,7 @@ def get_nastran_results(model_id: str) -> str:
 
 
 @mcp.tool()
+@run_in_thread
 def get_material_data(model_id: str) -> str:
   """Retrieves Nastran model material data.
 
@@ -52,76 +52,93 @@ def get_material_data(model_id: str) -> str:
 
 
 @mcp.tool()
-def extract_nastran_input(model_id: str) -> str:
+async def extract_nastran_input(model_id: str,
+                                wait: bool = True) -> str:
   """Extracts information from a Nastran input (bdf) file.
 
      Args:
        model_id (str): The UUID of the Nastran bdf model to extract
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
-  job = submit_job(model_id = model_id,
-                   function = '@istari:extract_input',
-                   tool_name = NASTRAN_EXTRACT_TOOL_NAME)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:extract_input',
+                                tool_name = NASTRAN_EXTRACT_TOOL_NAME)
   print(f"Job submitted with ID: {job.id}")
 
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait)
 
 
 @mcp.tool()
-def extract_nastran_results(model_id: str) -> str:
+async def extract_nastran_results(model_id: str,
+                                  wait: bool = True) -> str:
   """Extracts information from a Nastran output (op2) file.
 
      Args:
        model_id (str): The UUID of the Nastran bdf model to extract
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
-  nast_res_file = os.path.join(tempfile.gettempdir(),
-                               NASTRAN_RESULTS_FILE_NAME)
   try:
-    download_artifact(model_id,
-                      NASTRAN_RESULTS_FILE_NAME,
-                      nast_res_file)
+    op2_rev = await asyncio.to_thread(find_artifact_revision,
+                                      model_id,
+                                      NASTRAN_RESULTS_FILE_NAME)
   except FileNotFoundError:
     return 'Nastran results artifact not found. Execute the Nastran model first.'
 
-  client = get_client()
-  op2_mod = client.add_model(nast_res_file)
-  
-  job = submit_job(model_id = op2_mod.id,
-                   function = '@istari:extract_results',
-                   tool_name = NASTRAN_EXTRACT_TOOL_NAME)
+  # Promote the op2 artifact to a temporary model by reference so the results
+  # never pass through this host. If the registry rejects the reference, fall
+  # back to downloading the results and uploading them as a new model
+  client = await asyncio.to_thread(get_client)
+  try:
+    op2_mod = await asyncio.to_thread(add_model_by_reference,
+                                      op2_rev)
+  except istari_digital_client.ApiException:
+    op2_mod = await asyncio.to_thread(add_model_by_copy,
+                                      model_id,
+                                      NASTRAN_RESULTS_FILE_NAME)
+
+  job = await asyncio.to_thread(submit_job,
+                                model_id = op2_mod.id,
+                                function = '@istari:extract_results',
+                                tool_name = NASTRAN_EXTRACT_TOOL_NAME)
   print(f"Job submitted with ID: {job.id}")
 
-  os.remove(nast_res_file)
-  job = wait_for_job(job)
-
-  if str(job.status.name).find('COMPLETE') >= 0:
-    op2_summ_file = os.path.join(tempfile.gettempdir(),
-                                 OP2_SUMMARY_FILE_NAME)
-    download_artifact(op2_mod.id,
-                      OP2_SUMMARY_FILE_NAME,
-                      op2_summ_file)
-    client.add_artifact(model_id,
-                        op2_summ_file)
-    os.remove(op2_summ_file)
-    client.archive_model(op2_mod.id)
-
-  return f"Job Complete [{job.status.name}]"
+  def attach_summary(job: "Job") -> None:
+    if str(job.status.name).find('COMPLETE') >= 0:
+      op2_summ_rev = find_artifact_revision(op2_mod.id,
+                                            OP2_SUMMARY_FILE_NAME)
+      try:
+        add_artifact_by_reference(model_id,
+                                  op2_summ_rev)
+      except istari_digital_client.ApiException:
+        add_artifact_by_copy(model_id,
+                             op2_mod.id,
+                             OP2_SUMMARY_FILE_NAME)
+      client.archive_model(op2_mod.id)
+
+  return await complete_job_async(job,
+                                  wait,
+                                  attach_summary)
                       
 
 @mcp.tool()
-def execute_nastran_simulation(model_id: str) -> str:
+async def execute_nastran_simulation(model_id: str,
+                                     wait: bool = True) -> str:
   """Executes a Nastran simulation on the specified model.
 
      Args:
        model_id (str): The UUID of the Nastran model
+       wait (bool): If True, waits for the job to finish. If False, returns the job ID immediately; use get_job_status or await_job to follow the job.
   """
-  job = submit_job(model_id = model_id,
-                   function = '@istari:run',
-                   tool_name = NASTRAN_TOOL_NAME)
+  job = await asyncio.to_thread(submit_job,
+                                model_id = model_id,
+                                function = '@istari:run',
+                                tool_name = NASTRAN_TOOL_NAME)
   print(f"Job submitted with ID: {job.id}")
 
-  job = wait_for_job(job)
-  return f"Job Complete [{job.status.name}]"
+  return await complete_job_async(job,
+                                  wait)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+"""
+Single MCP server hosting the tools of every enabled Istari tool family.
+
+Each family is defined in its own istari-<family>.py script (which can still
+be run on its own). This server loads the scripts of the families listed in
+TOOL_FAMILIES; their tools all register on the shared server returned by
+get_server(). Heavy dependencies are only loaded by the tools that use them.
+"""
+import importlib.util
+import os
+
+from shared.constants import TOOL_FAMILIES
+from shared.server import get_server
+
+
+def load_tool_family(family: str) -> None:
+  script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        f"istari-{family}.py")
+  if not os.path.exists(script):
+    raise ValueError(f"Unknown tool family: {family}")
+
+  spec = importlib.util.spec_from_file_location(f"istari_{family}",
+                                                script)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+
+
+if __name__ == "__main__":
+  for family in TOOL_FAMILIES:
+    load_tool_family(family)
+
+  print(f"MCP Server is running [{', '.join(TOOL_FAMILIES)}]")
+  get_server().run(transport='stdio')
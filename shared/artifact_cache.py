@@ -0,0 +1,274 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+
+class ArtifactCache:
+  """
+  Two-level (memory + disk) cache of artifact revision contents keyed by
+  revision ID.
+
+  Revisions are immutable, so cached contents never go stale; entries are only
+  dropped by LRU eviction once the memory or disk size cap is exceeded.
+  Contents larger than max_entry_size are not cached at all, so a single large
+  download cannot flush the rest of the cache. Disk
+  entries are verified against the revision's content token when read back
+  (the SHA-384 digest of the contents followed by the token's salt, as checked
+  by the registry client); corrupt entries are discarded and treated as a miss.
+
+  The cache directory is created private to the current user. Only the memory
+  cache is guarded by a lock; disk entries are written to a temporary file
+  and moved into place, so concurrent readers never see partial entries.
+  """
+
+  def __init__(self,
+               cache_dir: str,
+               mem_size: int,
+               disk_size: int,
+               max_entry_size: int):
+    self.cache_dir = cache_dir
+    self.mem_size = mem_size
+    self.disk_size = disk_size
+    self.max_entry_size = max_entry_size
+    self._mem = OrderedDict()
+    self._mem_used = 0
+    self._lock = threading.Lock()
+    self._evict_lock = threading.Lock()
+    _make_private_dir(self.cache_dir)
+
+
+  def get(self,
+          art_rev) -> bytes:
+    """
+    Returns the cached contents of the revision, or None on a cache miss.
+    """
+    rev_id = str(art_rev.id)
+    with self._lock:
+      data = self._mem.get(rev_id)
+      if data is not None:
+        self._mem.move_to_end(rev_id)
+        return data
+
+    data = self._read_disk(art_rev)
+    if data is not None:
+      with self._lock:
+        self._put_mem(rev_id, data)
+
+    return data
+
+
+  def put(self,
+          art_rev,
+          data: bytes) -> None:
+    if len(data) > self.max_entry_size:
+      return
+
+    rev_id = str(art_rev.id)
+    self._write_disk(rev_id, data)
+    with self._lock:
+      self._put_mem(rev_id, data)
+
+
+  def read(self,
+           art_rev) -> bytes:
+    """
+    Returns the contents of an artifact revision, downloading them from the
+    registry only on a cache miss.
+    """
+    data = self.get(art_rev)
+    if data is None:
+      data = art_rev.read_bytes()
+      self.put(art_rev, data)
+
+    return data
+
+
+  def copy_to(self,
+              art_rev,
+              dest_file: str,
+              chunk_size: int,
+              progress: Callable[[int, int], None] = None) -> bool:
+    """
+    Copies a cached revision to dest_file in chunk_size blocks, verifying it
+    against the content token on the way, without loading it into memory.
+    Returns False on a cache miss or if the cached entry is corrupt.
+    """
+    data_path = self.get_path(art_rev.id)
+    try:
+      fin = open(data_path, 'rb')
+    except FileNotFoundError:
+      return False
+
+    hasher = hashlib.sha384()
+    with fin:
+      total = os.fstat(fin.fileno()).st_size
+      write_chunks(iter(lambda: fin.read(chunk_size), b''),
+                   dest_file,
+                   total,
+                   progress,
+                   hasher)
+
+    if not _content_verified(hasher, art_rev):
+      os.remove(dest_file)
+      self._remove_disk(str(art_rev.id))
+      return False
+
+    _touch(data_path)
+    return True
+
+
+  def get_path(self,
+               rev_id: str) -> str:
+    return os.path.join(self.cache_dir, str(rev_id))
+
+
+  def clear(self) -> None:
+    with self._lock:
+      self._mem.clear()
+      self._mem_used = 0
+    for entry in os.scandir(self.cache_dir):
+      if entry.is_file():
+        _remove_file(entry.path)
+
+
+  def _put_mem(self,
+               rev_id: str,
+               data: bytes) -> None:
+    if len(data) > self.mem_size:
+      return
+
+    old_data = self._mem.pop(rev_id, None)
+    if old_data is not None:
+      self._mem_used -= len(old_data)
+    self._mem[rev_id] = data
+    self._mem_used += len(data)
+    while self._mem_used > self.mem_size:
+      _,evicted = self._mem.popitem(last=False)
+      self._mem_used -= len(evicted)
+
+
+  def _read_disk(self,
+                 art_rev) -> bytes:
+    data_path = self.get_path(art_rev.id)
+    try:
+      with open(data_path, 'rb') as fin:
+        data = fin.read()
+    except FileNotFoundError:
+      return None
+
+    hasher = hashlib.sha384(data)
+    if not _content_verified(hasher, art_rev):
+      self._remove_disk(str(art_rev.id))
+      return None
+
+    # Touch the entry so eviction order follows last access
+    _touch(data_path)
+    return data
+
+
+  def _write_disk(self,
+                  rev_id: str,
+                  data: bytes) -> None:
+    if len(data) > self.disk_size:
+      return
+
+    fd, tmp_path = tempfile.mkstemp(suffix = '.tmp',
+                                    dir = self.cache_dir)
+    with os.fdopen(fd, 'wb') as fout:
+      fout.write(data)
+    os.replace(tmp_path, self.get_path(rev_id))
+
+    self._evict_disk()
+
+
+  def _remove_disk(self,
+                   rev_id: str) -> None:
+    _remove_file(self.get_path(rev_id))
+
+
+  def _evict_disk(self) -> None:
+    # A concurrent put is already evicting; it will see this entry too
+    if not self._evict_lock.acquire(blocking = False):
+      return
+
+    try:
+      entries = []
+      disk_used = 0
+      for entry in os.scandir(self.cache_dir):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+          try:
+            stat = entry.stat()
+          except FileNotFoundError:
+            continue
+          entries.append((stat.st_mtime, stat.st_size, entry.name))
+          disk_used += stat.st_size
+
+      entries.sort()
+      for _,size,rev_id in entries:
+        if disk_used <= self.disk_size:
+          break
+        self._remove_disk(rev_id)
+        disk_used -= size
+    finally:
+      self._evict_lock.release()
+
+
+def _make_private_dir(path: str) -> None:
+  """
+  Creates a directory accessible only by the current user. An existing
+  directory owned by another user is rejected, since its entries could have
+  been planted by that user.
+  """
+  os.makedirs(path, mode = 0o700, exist_ok = True)
+  if hasattr(os, 'getuid'):
+    if os.stat(path).st_uid != os.getuid():
+      raise PermissionError(f"Cache directory is owned by another user: {path}")
+    os.chmod(path, 0o700)
+
+
+def _content_verified(hasher,
+                      art_rev) -> bool:
+  token = art_rev.content_token
+  hasher.update(token.salt.encode('utf-8'))
+  return hasher.hexdigest() == token.sha
+
+
+def _touch(path: str) -> None:
+  try:
+    os.utime(path)
+  except FileNotFoundError:
+    pass
+
+
+def _remove_file(path: str) -> None:
+  try:
+    os.remove(path)
+  except FileNotFoundError:
+    pass
+
+
+def write_chunks(chunks: Iterable[bytes],
+                 dest_file: str,
+                 total: int,
+                 progress: Callable[[int, int], None] = None,
+                 hasher = None) -> None:
+  """
+  Writes a stream of chunks to dest_file, reporting progress after each chunk.
+  The data is written to a '.part' file that replaces dest_file only once the
+  stream has been fully written.
+  """
+  part_file = f"{dest_file}.part"
+  done = 0
+  with open(part_file, 'wb') as fout:
+    for chunk in chunks:
+      fout.write(chunk)
+      if hasher is not None:
+        hasher.update(chunk)
+      done += len(chunk)
+      if progress is not None:
+        progress(done, total)
+
+  os.replace(part_file, dest_file)
@@ -0,0 +1,257 @@
+"""
+asyncio counterparts of the blocking helpers in shared.helpers.
+
+FastMCP calls synchronous tools directly on its event loop, so a tool that
+blocks on a registry request (or sleeps while polling a job) stalls every
+other tool call on the same server. Tools should either be declared
+'async def' and wait with the coroutines below, or be wrapped with
+run_in_thread so their blocking calls run on a worker thread.
+"""
+import asyncio
+import functools
+from time import monotonic
+from typing import TYPE_CHECKING, Callable
+
+from mcp.server.fastmcp import FastMCP
+from shared.constants import JOB_POLL_MIN_INTERVAL, JOB_WAIT_TIMEOUT, MODEL_POLL_INTERVAL, MODEL_WAIT_TIMEOUT
+from shared.helpers import cancel_job_thread, complete_job, fetch_latest_revisions, finish_job, get_client, get_job_result, has_job_thread, is_job_done, next_poll_interval, poll_delay, untrack_job
+from shared.helpers import istari_digital_client
+
+if TYPE_CHECKING:
+  from istari_digital_client import Job
+  from istari_digital_client.models import FileRevision
+
+
+_job_tools_servers = []
+
+
+def run_in_thread(fn: Callable) -> Callable:
+  """
+  Wraps a blocking tool function in a coroutine that runs it on a worker
+  thread. The wrapper keeps the function's name, docstring and signature so it
+  can be registered with mcp.tool() in place of the original.
+  """
+  @functools.wraps(fn)
+  async def wrapper(*args, **kwargs):
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+  return wrapper
+
+
+async def wait_for_job_async(job: "Job",
+                             timeout: float = JOB_WAIT_TIMEOUT) -> "Job":
+  """
+  Waits for a job to reach a terminal status without blocking the event loop,
+  using the same backoff as wait_for_job.
+
+  Throws TimeoutError if the job has not finished within timeout seconds
+  (a timeout of 0 or None waits indefinitely).
+  """
+  client = await asyncio.to_thread(get_client)
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  interval = JOB_POLL_MIN_INTERVAL
+  last_status = job.status.name
+  while not is_job_done(job):
+    delay = poll_delay(interval)
+    if deadline is not None:
+      remaining = deadline - monotonic()
+      if remaining <= 0:
+        raise TimeoutError(f"Job {job.id} did not finish within {timeout} seconds [{job.status.name}]")
+      delay = min(delay, remaining)
+
+    await asyncio.sleep(delay)
+    job = await asyncio.to_thread(client.get_job, job.id)
+
+    if job.status.name != last_status:
+      last_status = job.status.name
+      interval = JOB_POLL_MIN_INTERVAL
+    else:
+      interval = next_poll_interval(interval)
+
+  finish_job(job)
+  return job
+
+
+async def complete_job_async(job: "Job",
+                             wait: bool = True,
+                             on_complete: Callable[["Job"], str] = None) -> str:
+  """
+  asyncio version of complete_job: waits for the job with wait_for_job_async
+  and runs on_complete on a worker thread.
+  """
+  if not wait:
+    return complete_job(job,
+                        wait,
+                        on_complete)
+
+  job = await wait_for_job_async(job)
+  ret_str = None
+  if on_complete is not None:
+    ret_str = await asyncio.to_thread(on_complete, job)
+  if ret_str is None:
+    ret_str = f"Job Complete [{job.status.name}]"
+
+  return ret_str
+
+
+async def wait_for_model_update_async(model_ids: list[str],
+                                     timeout: float = MODEL_WAIT_TIMEOUT) -> tuple[str, "FileRevision"]:
+  """
+  Waits until a new revision of any of the models is uploaded without blocking
+  the event loop and returns (model ID, new latest revision).
+
+  Like watch_models, every poll round fetches the models concurrently, but a
+  worker thread is only used while a round is being fetched; between rounds
+  the coroutine sleeps, so cancelling it stops the polling.
+
+  Throws TimeoutError if no model has changed within timeout seconds (a
+  timeout of 0 or None waits indefinitely).
+  """
+  model_ids = list(dict.fromkeys(model_ids))
+  if len(model_ids) == 0:
+    raise ValueError("No models to watch")
+
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  latest_revs = await asyncio.to_thread(fetch_latest_revisions,
+                                        model_ids)
+  baseline = [latest_rev.id for latest_rev in latest_revs]
+  while True:
+    delay = MODEL_POLL_INTERVAL
+    if deadline is not None:
+      remaining = deadline - monotonic()
+      if remaining <= 0:
+        raise TimeoutError(f"No model changed within {timeout} seconds: {model_ids}")
+      delay = min(delay, remaining)
+
+    await asyncio.sleep(delay)
+    latest_revs = await asyncio.to_thread(fetch_latest_revisions,
+                                          model_ids)
+    for mod_id, base_rev_id, latest_rev in zip(model_ids, baseline, latest_revs):
+      if latest_rev.id != base_rev_id:
+        return (mod_id, latest_rev)
+
+
+async def wait_for_job_result_async(job_id: str,
+                                    timeout: float = JOB_WAIT_TIMEOUT) -> str:
+  """
+  Waits for the background thread started by complete_job for the job to
+  finish and returns its result, or None if the job has no such thread.
+
+  The result is polled with the same backoff as wait_for_job_async, so no
+  worker thread is held while waiting. Throws TimeoutError if the thread has
+  not finished within timeout seconds (a timeout of 0 or None waits
+  indefinitely).
+  """
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  interval = JOB_POLL_MIN_INTERVAL
+  while has_job_thread(job_id):
+    delay = poll_delay(interval)
+    if deadline is not None:
+      remaining = deadline - monotonic()
+      if remaining <= 0:
+        raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+      delay = min(delay, remaining)
+
+    await asyncio.sleep(delay)
+    interval = next_poll_interval(interval)
+
+  return get_job_result(job_id)
+
+
+def register_job_tools(mcp: FastMCP) -> None:
+  """
+  Registers the tools used to follow jobs submitted with wait=False. Several
+  tool families share a server, so the tools are only registered once per
+  server.
+  """
+  if mcp in _job_tools_servers:
+    return
+  _job_tools_servers.append(mcp)
+
+  @mcp.tool()
+  @run_in_thread
+  def get_job_status(job_id: str) -> dict[str, str]:
+    """Gets the current status of a job without waiting for it to finish.
+
+       Args:
+         job_id (str): The UUID of the job returned when the job was submitted.
+
+       Returns:
+         A dictionary with the job status, status message and, once any post-processing has finished, the job result.
+    """
+    client = get_client()
+    job = client.get_job(job_id)
+    job_stat = {"job_id": job.id,
+                "model_id": str(job.model_id),
+                "function": job.function.name,
+                "status": str(job.status.name.value),
+                "message": str(job.status.message),
+                "done": str(is_job_done(job))}
+    ret_str = get_job_result(job_id)
+    if ret_str is not None:
+      job_stat["result"] = ret_str
+
+    return job_stat
+
+
+  @mcp.tool()
+  async def await_job(job_id: str,
+                      timeout: float = 0) -> str:
+    """Waits for a previously submitted job to finish, including any post-processing of its results.
+
+       Args:
+         job_id (str): The UUID of the job returned when the job was submitted.
+         timeout (float): The maximum number of seconds to wait. A value of 0 waits until the job finishes.
+    """
+    # complete_job already polls the job in its background thread, so wait for
+    # its result rather than polling the registry a second time
+    try:
+      ret_str = await wait_for_job_result_async(job_id,
+                                                timeout)
+    except TimeoutError:
+      return f"Job still running after {timeout} seconds"
+    if ret_str is not None:
+      return ret_str
+
+    client = await asyncio.to_thread(get_client)
+    try:
+      job = await asyncio.to_thread(client.get_job, job_id)
+      job = await wait_for_job_async(job,
+                                     timeout = timeout)
+    except TimeoutError:
+      return f"Job still running after {timeout} seconds"
+
+    ret_str = get_job_result(job_id)
+    if ret_str is None:
+      ret_str = f"Job Complete [{job.status.name}]"
+
+    return ret_str
+
+
+  @mcp.tool()
+  @run_in_thread
+  def cancel_job(job_id: str) -> str:
+    """Cancels a job that has not finished yet.
+
+       Args:
+         job_id (str): The UUID of the job to cancel.
+    """
+    client = get_client()
+    job = client.get_job(job_id)
+    if is_job_done(job):
+      return f"Job already finished [{job.status.name}]"
+
+    job = client.update_job_status(job_id,
+                                   istari_digital_client.JobStatusName.CANCELED)
+    untrack_job(job_id)
+    cancel_job_thread(job_id)
+    return f"Job Canceled [{job.status.name}]"
@@ -1,5 +1,7 @@
 import dotenv
+import getpass
 import os
+import tempfile
 
 dotenv.load_dotenv()
 
@@ -15,6 +17,39 @@ REG_AUTH_TOKEN = os.getenv('REG_AUTH_TOKEN')
 CAD_MODEL_ID = os.getenv('CAD_MODEL_ID')
 CAMEO_MODEL_ID = os.getenv('CAMEO_MODEL_ID')
 
+TOOL_FAMILIES = [family.strip() for family in os.getenv('TOOL_FAMILIES', 'main,3dexperience,cameo,excel,nastran').split(',') if family.strip() != '']
+
+REG_POOL_SIZE = int(os.getenv('REG_POOL_SIZE', '10'))
+REG_POOL_IDLE_TIMEOUT = float(os.getenv('REG_POOL_IDLE_TIMEOUT', '300'))
+REG_RETRY_MAX_ATTEMPTS = int(os.getenv('REG_RETRY_MAX_ATTEMPTS', '5'))
+REG_RETRY_MIN_INTERVAL_MILLIS = int(os.getenv('REG_RETRY_MIN_INTERVAL_MILLIS', '500'))
+REG_RETRY_MAX_INTERVAL_MILLIS = int(os.getenv('REG_RETRY_MAX_INTERVAL_MILLIS', '30000'))
+
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv('UPLOAD_MULTIPART_THRESHOLD', str(64 * 1024 * 1024)))
+UPLOAD_MULTIPART_CHUNKSIZE = int(os.getenv('UPLOAD_MULTIPART_CHUNKSIZE', str(16 * 1024 * 1024)))
+
+JOB_POLL_MIN_INTERVAL = float(os.getenv('JOB_POLL_MIN_INTERVAL', '1'))
+JOB_POLL_MAX_INTERVAL = float(os.getenv('JOB_POLL_MAX_INTERVAL', '30'))
+JOB_POLL_BACKOFF = float(os.getenv('JOB_POLL_BACKOFF', '2'))
+JOB_POLL_JITTER = os.getenv('JOB_POLL_JITTER', 'true').lower() != 'false'
+JOB_WAIT_TIMEOUT = float(os.getenv('JOB_WAIT_TIMEOUT', '0'))
+JOB_POLL_WORKERS = int(os.getenv('JOB_POLL_WORKERS', '8'))
+MODEL_POLL_INTERVAL = float(os.getenv('MODEL_POLL_INTERVAL', '5'))
+MODEL_WAIT_TIMEOUT = float(os.getenv('MODEL_WAIT_TIMEOUT', '3600'))
+LATEST_REVISION_TTL = float(os.getenv('LATEST_REVISION_TTL', '30'))
+
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '100'))
+PAGE_WORKERS = int(os.getenv('PAGE_WORKERS', '4'))
+LOOKUP_WORKERS = int(os.getenv('LOOKUP_WORKERS', '8'))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+
+ARTIFACT_CACHE_ENABLED = os.getenv('ARTIFACT_CACHE_ENABLED', 'true').lower() != 'false'
+ARTIFACT_CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR',
+                               os.path.join(tempfile.gettempdir(), f"istari_artifact_cache_{getpass.getuser()}"))
+ARTIFACT_CACHE_MEM_SIZE = int(os.getenv('ARTIFACT_CACHE_MEM_SIZE', str(64 * 1024 * 1024)))
+ARTIFACT_CACHE_DISK_SIZE = int(os.getenv('ARTIFACT_CACHE_DISK_SIZE', str(2 * 1024 * 1024 * 1024)))
+ARTIFACT_CACHE_MAX_ENTRY_SIZE = int(os.getenv('ARTIFACT_CACHE_MAX_ENTRY_SIZE', str(256 * 1024 * 1024)))
+
 REQ_FILE_NAME = 'requirements.json'
 PARAM_FILE_NAME = 'parameters.json'
 PARTS_FILE_NAME = 'parts.json'
@@ -1,18 +1,123 @@
-from time import sleep
-
-from istari_digital_client import Client, Configuration, Job, Model
-from istari_digital_client.models import JobStatusName
-from shared.constants import REG_URL, REG_AUTH_TOKEN
-
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Callable, Iterator
+
+import urllib3
+from shared.artifact_cache import ArtifactCache, write_chunks
+from shared.constants import ARTIFACT_CACHE_ENABLED, ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MEM_SIZE, ARTIFACT_CACHE_DISK_SIZE, ARTIFACT_CACHE_MAX_ENTRY_SIZE
+from shared.constants import REG_URL, REG_AUTH_TOKEN, REG_POOL_SIZE, REG_POOL_IDLE_TIMEOUT
+from shared.constants import REG_RETRY_MAX_ATTEMPTS, REG_RETRY_MIN_INTERVAL_MILLIS, REG_RETRY_MAX_INTERVAL_MILLIS
+from shared.constants import UPLOAD_MULTIPART_THRESHOLD, UPLOAD_MULTIPART_CHUNKSIZE
+from shared.constants import JOB_POLL_MIN_INTERVAL, JOB_POLL_MAX_INTERVAL, JOB_POLL_BACKOFF, JOB_POLL_JITTER, JOB_WAIT_TIMEOUT, JOB_POLL_WORKERS
+from shared.constants import MODEL_POLL_INTERVAL, MODEL_WAIT_TIMEOUT, LATEST_REVISION_TTL
+from shared.constants import PAGE_SIZE, PAGE_WORKERS, LOOKUP_WORKERS, DOWNLOAD_CHUNK_SIZE
+from shared.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+  from istari_digital_client import Artifact, Client, Job, Model, Token
+  from istari_digital_client.models import FileRevision
+
+# Loading the registry client takes most of the server startup time, so it is
+# deferred until get_client() first runs
+istari_digital_client = lazy_import('istari_digital_client')
+
+
+# Values of the JobStatusName str enum, which compare equal to its members
+JOB_DONE_STATUSES = ['Completed',
+                     'Failed',
+                     'Canceled']
 
 job_list = []
+_job_list_lock = threading.Lock()
+_job_cancel_events = {}
+_job_results = {}
+
+_artifact_index = {}
+_artifact_index_model_locks = {}
+_artifact_index_lock = threading.Lock()
+
+_revision_resource_memo = {}
+_file_resource_memo = {}
+_user_name_memo = {}
+_latest_revision_memo = {}
+_available_function_memo = set()
+_memo_lock = threading.Lock()
+
+artifact_cache = None
+if ARTIFACT_CACHE_ENABLED:
+  artifact_cache = ArtifactCache(ARTIFACT_CACHE_DIR,
+                                 ARTIFACT_CACHE_MEM_SIZE,
+                                 ARTIFACT_CACHE_DISK_SIZE,
+                                 ARTIFACT_CACHE_MAX_ENTRY_SIZE)
+
+_client = None
+_client_key = None
+_client_last_used = 0.0
+_client_lock = threading.Lock()
+
+def get_client() -> Client:
+  """
+  Returns the process-wide registry client.
 
-def get_client():
-  configuration = Configuration(
-      registry_url=REG_URL,
-      registry_auth_token=REG_AUTH_TOKEN)
-
-  return Client(config = configuration)
+  The client (and its HTTP connection pool) is shared by every caller and is
+  only rebuilt when REG_URL or REG_AUTH_TOKEN changes. Idle pooled connections
+  are dropped once they exceed REG_POOL_IDLE_TIMEOUT seconds.
+  """
+  global _client, _client_key, _client_last_used
+  reg_url = os.getenv('REG_URL', REG_URL)
+  reg_auth_token = os.getenv('REG_AUTH_TOKEN', REG_AUTH_TOKEN)
+  client_key = (reg_url, reg_auth_token)
+
+  with _client_lock:
+    now = monotonic()
+    if _client is None or _client_key != client_key:
+      # Large uploads are split into multipart_chunksize parts by the storage
+      # client; each part is retried on its own with the configured backoff so
+      # a transient failure does not restart the whole upload. The client's own
+      # filesystem cache is turned off when the artifact cache is in use, so
+      # downloaded contents are not written to disk twice
+      configuration = istari_digital_client.Configuration(
+          registry_url=reg_url,
+          registry_auth_token=reg_auth_token,
+          multipart_threshold=UPLOAD_MULTIPART_THRESHOLD,
+          multipart_chunksize=UPLOAD_MULTIPART_CHUNKSIZE,
+          retry_max_attempts=REG_RETRY_MAX_ATTEMPTS,
+          retry_min_interval_millis=REG_RETRY_MIN_INTERVAL_MILLIS,
+          retry_max_interval_millis=REG_RETRY_MAX_INTERVAL_MILLIS,
+          filesystem_cache_enabled=artifact_cache is None)
+      _client = istari_digital_client.Client(config = configuration)
+      _client_key = client_key
+      _configure_pool(_client)
+    elif now - _client_last_used > REG_POOL_IDLE_TIMEOUT:
+      _get_pool_manager(_client).clear()
+
+    _client_last_used = now
+    return _client
+
+
+def _get_pool_manager(client: Client) -> urllib3.PoolManager:
+  return client._api_client.rest_client.pool_manager
+
+
+def _configure_pool(client: Client) -> None:
+  # The generated REST client builds a PoolManager with urllib3's default of
+  # one connection per host; rebuild it with the configured pool size so that
+  # concurrent callers share keep-alive connections instead of opening new ones.
+  rest_client = client._api_client.rest_client
+  pool_kw = dict(rest_client.pool_manager.connection_pool_kw)
+  pool_kw['maxsize'] = REG_POOL_SIZE
+  rest_client.pool_manager = urllib3.PoolManager(num_pools = REG_POOL_SIZE,
+                                                 **pool_kw)
 
 
 def submit_job(model_id: str,
@@ -26,33 +131,410 @@ def submit_job(model_id: str,
                         tool_name = tool_name,
                         tool_version = tool_ver,
                         parameters_file = params_file)
-  job_list.append(job.id)
+  with _job_list_lock:
+    job_list.append(job.id)
   return job
 
 
-def wait_for_job(job) -> Job:
+def is_function_available(function: str,
+                          tool_name: str) -> bool:
+  """
+  Returns True if the registry lists a job function with the given name for
+  the tool. Functions found are remembered for the life of the process; a
+  missing function is looked up again on the next call, so newly deployed
+  functions are picked up.
+  """
+  key = (function, tool_name)
+  with _memo_lock:
+    if key in _available_function_memo:
+      return True
+
+  client = get_client()
+  funcs = list_all_pages(client.list_functions,
+                         name = function,
+                         tool = tool_name)
+  available = any(func.name == function for func in funcs)
+  if available:
+    with _memo_lock:
+      _available_function_memo.add(key)
+
+  return available
+
+
+def untrack_job(job_id: str) -> None:
+  with _job_list_lock:
+    if job_id in job_list:
+      job_list.remove(job_id)
+
+
+def finish_job(job: Job) -> None:
+  """
+  Stops tracking a finished job. A job may have generated new revisions of
+  existing artifacts, so the model's artifact index is dropped and rebuilt on
+  the next lookup.
+  """
+  untrack_job(job.id)
+  invalidate_artifact_index(str(job.model_id))
+
+
+def write_params_file(params: dict) -> str:
+  """
+  Writes job parameters to an 'input.json' file in a private temporary
+  directory, so that concurrent tool calls never overwrite each other's
+  parameters, and returns its path.
+  """
+  input_file = os.path.join(tempfile.mkdtemp(),
+                            'input.json')
+  with open(input_file, 'w') as fout:
+    json.dump(params,
+              fout)
+
+  return input_file
+
+
+def remove_params_file(input_file: str) -> None:
+  shutil.rmtree(os.path.dirname(input_file),
+                ignore_errors = True)
+
+
+def list_all_pages(list_method: Callable,
+                   *args,
+                   page_size: int = PAGE_SIZE,
+                   page_workers: int = PAGE_WORKERS,
+                   **kwargs) -> list:
+  """
+  Returns the items of every page of a paginated registry listing.
+
+  The first page is fetched on its own to learn the page count; the remaining
+  pages are then fetched concurrently (at most page_workers at once) and
+  returned in page order. If the listing does not report a page count, pages
+  are fetched in order until a short page is returned.
+  """
+  def get_page(pg_idx: int):
+    return list_method(*args,
+                       page = pg_idx,
+                       size = page_size,
+                       **kwargs)
+
+  first_pg = get_page(1)
+  items = list(first_pg.items)
+  page_count = first_pg.pages
+  if page_count is None and first_pg.total is not None:
+    page_count = -(-first_pg.total // page_size)
+
+  if page_count is None:
+    pg = first_pg
+    pg_idx = 1
+    while len(pg.items) >= page_size:
+      pg_idx += 1
+      pg = get_page(pg_idx)
+      items.extend(pg.items)
+  elif page_count > 1:
+    max_workers = max(1, min(page_workers, page_count - 1))
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+      for pg in pool.map(get_page, range(2, page_count + 1)):
+        items.extend(pg.items)
+
+  return items
+
+
+def is_job_done(job: Job) -> bool:
+  return job.status.name in JOB_DONE_STATUSES
+
+
+def next_poll_interval(interval: float) -> float:
+  """
+  Returns the base interval of the next job status poll, growing the previous
+  base interval by JOB_POLL_BACKOFF up to JOB_POLL_MAX_INTERVAL.
+  """
+  return min(interval * JOB_POLL_BACKOFF, JOB_POLL_MAX_INTERVAL)
+
+
+def poll_delay(interval: float) -> float:
+  """
+  Returns the time to sleep before a poll with the given base interval. With
+  JOB_POLL_JITTER the delay is drawn between JOB_POLL_MIN_INTERVAL and the
+  base interval; the base interval itself keeps growing unjittered.
+  """
+  if JOB_POLL_JITTER:
+    return random.uniform(JOB_POLL_MIN_INTERVAL, interval)
+
+  return interval
+
+
+def wait_for_job(job: Job,
+                 timeout: float = JOB_WAIT_TIMEOUT,
+                 cancel_event: threading.Event = None,
+                 show_status: bool = True) -> Job:
+  """
+  Waits for a job to reach a terminal status and returns the final job.
+
+  The registry is polled with exponential backoff between JOB_POLL_MIN_INTERVAL
+  and JOB_POLL_MAX_INTERVAL seconds; the interval is reset whenever the job
+  changes status so state transitions are still picked up promptly.
+
+  Throws TimeoutError if the job has not finished within timeout seconds
+  (a timeout of 0 or None waits indefinitely). If cancel_event is set, waiting
+  stops and the most recently fetched job is returned. Status output is
+  suppressed when show_status is False (e.g. when waiting in the background).
+  """
   client = get_client()
   empty_str = ' ' * 64
-  while not job.status.name in [JobStatusName.COMPLETED, 
-                                JobStatusName.FAILED]:
-    sleep(1)
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  interval = JOB_POLL_MIN_INTERVAL
+  last_status = job.status.name
+  while not is_job_done(job):
+    delay = poll_delay(interval)
+    if deadline is not None:
+      remaining = deadline - monotonic()
+      if remaining <= 0:
+        if show_status: print(empty_str, end="\r")
+        raise TimeoutError(f"Job {job.id} did not finish within {timeout} seconds [{job.status.name}]")
+      delay = min(delay, remaining)
+
+    if cancel_event is not None:
+      if cancel_event.wait(delay): break
+    else:
+      sleep(delay)
+
     job = client.get_job(job.id)
-    print(empty_str, end="\r")
-    job_stat = format_str(job.status.name, 1)
-    print(f"Job Status: {job_stat}", end="\r")
+    if show_status:
+      print(empty_str, end="\r")
+      job_stat = format_str(job.status.name, 1)
+      print(f"Job Status: {job_stat}", end="\r")
+
+    if job.status.name != last_status:
+      last_status = job.status.name
+      interval = JOB_POLL_MIN_INTERVAL
+    else:
+      interval = next_poll_interval(interval)
 
-  if job.id in job_list:
-    job_list.remove(job.id)
+  if is_job_done(job):
+    finish_job(job)
 
-  print(empty_str, end="\r")
+  if show_status: print(empty_str, end="\r")
   return job
 
 
-def wait_for_all_jobs():
+def watch_jobs(job_ids: list[str],
+               timeout: float = JOB_WAIT_TIMEOUT,
+               cancel_event: threading.Event = None,
+               show_status: bool = True) -> Iterator[Job]:
+  """
+  Tracks a set of jobs in a single polling loop and yields each job as soon as
+  it reaches a terminal status.
+
+  Every poll round fetches the status of all pending jobs concurrently (at most
+  JOB_POLL_WORKERS requests at once) and uses the same backoff as wait_for_job.
+
+  Throws TimeoutError if any job has not finished within timeout seconds. If
+  cancel_event is set, watching stops and the unfinished jobs are not yielded.
+  Status output is suppressed when show_status is False.
+  """
   client = get_client()
-  for job_id in job_list:
-    job = client.get_job(job_id)
-    wait_for_job(job)
+  pending = list(dict.fromkeys(job_ids))
+  job_count = len(pending)
+  done_count = 0
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  interval = JOB_POLL_MIN_INTERVAL
+  max_workers = max(1, min(JOB_POLL_WORKERS, job_count))
+  with ThreadPoolExecutor(max_workers = max_workers) as pool:
+    while len(pending) > 0:
+      jobs = pool.map(client.get_job, pending)
+      still_pending = []
+      for job_id, job in zip(pending, jobs):
+        if is_job_done(job):
+          finish_job(job)
+          done_count += 1
+          if show_status: print(f"Jobs Complete: {done_count}/{job_count}", end="\r")
+          yield job
+        else:
+          still_pending.append(job_id)
+
+      if len(still_pending) < len(pending):
+        interval = JOB_POLL_MIN_INTERVAL
+      else:
+        interval = next_poll_interval(interval)
+      pending = still_pending
+      if len(pending) == 0:
+        break
+
+      delay = poll_delay(interval)
+      if deadline is not None:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+          raise TimeoutError(f"{len(pending)} of {job_count} jobs did not finish within {timeout} seconds: {pending}")
+        delay = min(delay, remaining)
+
+      if cancel_event is not None:
+        if cancel_event.wait(delay): break
+      else:
+        sleep(delay)
+
+  if show_status: print(' ' * 64, end="\r")
+
+
+def wait_for_all_jobs(show_status: bool = True) -> list[Job]:
+  with _job_list_lock:
+    job_ids = list(job_list)
+
+  return list(watch_jobs(job_ids,
+                         show_status = show_status))
+
+
+def complete_job(job: Job,
+                 wait: bool = True,
+                 on_complete: Callable[[Job], str] = None) -> str:
+  """
+  Finishes a submitted job on behalf of a tool and returns the tool response.
+
+  When wait is True the job is waited on and on_complete (if given) is called
+  with the finished job; its return value, if not None, replaces the default
+  "Job Complete" response. When wait is False the job handle is returned
+  immediately and on_complete runs in a background thread once the job has
+  finished, unless the job is canceled with cancel_job_thread first. Use
+  get_job_status/await_job to retrieve the outcome.
+  """
+  if not wait:
+    if on_complete is not None:
+      cancel_event = threading.Event()
+      thread = threading.Thread(target = _complete_job_background,
+                                args = (job, on_complete, cancel_event),
+                                daemon = True)
+      with _job_list_lock:
+        _job_cancel_events[job.id] = cancel_event
+      thread.start()
+    return f"Job Submitted [{job.id}]"
+
+  job = wait_for_job(job)
+  ret_str = None
+  if on_complete is not None:
+    ret_str = on_complete(job)
+  if ret_str is None:
+    ret_str = f"Job Complete [{job.status.name}]"
+
+  return ret_str
+
+
+def _complete_job_background(job: Job,
+                             on_complete: Callable[[Job], str],
+                             cancel_event: threading.Event) -> None:
+  try:
+    job = wait_for_job(job,
+                       cancel_event = cancel_event,
+                       show_status = False)
+    if cancel_event.is_set():
+      ret_str = "Job Canceled"
+    else:
+      ret_str = on_complete(job)
+      if ret_str is None:
+        ret_str = f"Job Complete [{job.status.name}]"
+  except Exception as excp:
+    ret_str = f"Exception thrown: {excp}"
+
+  # The result is recorded and the job removed from the running set under one
+  # lock, so a job without a background thread always has its result
+  with _job_list_lock:
+    _job_results[job.id] = ret_str
+    _job_cancel_events.pop(job.id, None)
+
+
+def get_job_result(job_id: str) -> str:
+  with _job_list_lock:
+    return _job_results.get(job_id)
+
+
+def has_job_thread(job_id: str) -> bool:
+  """
+  Returns True while the background thread started by complete_job for the
+  job is still running.
+  """
+  with _job_list_lock:
+    return job_id in _job_cancel_events
+
+
+def cancel_job_thread(job_id: str) -> None:
+  """
+  Stops the background thread started by complete_job for the job, without
+  running its post-processing.
+  """
+  with _job_list_lock:
+    cancel_event = _job_cancel_events.get(job_id)
+  if cancel_event is not None:
+    cancel_event.set()
+
+
+def resolve_concurrently(keys: list,
+                         fetch: Callable,
+                         memo: dict) -> dict:
+  """
+  Returns a dictionary mapping each key to fetch(key).
+
+  Keys are deduplicated, keys already present in the memo table are served
+  from it, and the remaining keys are fetched concurrently (at most
+  LOOKUP_WORKERS at once) and added to the memo table.
+  """
+  keys = list(dict.fromkeys(keys))
+  with _memo_lock:
+    missing = [key for key in keys if key not in memo]
+
+  if len(missing) > 0:
+    max_workers = min(LOOKUP_WORKERS, len(missing))
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+      fetched = list(pool.map(fetch, missing))
+    with _memo_lock:
+      memo.update(zip(missing, fetched))
+
+  with _memo_lock:
+    return {key: memo[key] for key in keys}
+
+
+def get_revision_resources(rev_ids: list[str]) -> dict[str, tuple[str, str]]:
+  """
+  Returns the (resource type, resource ID) of the file owning each of the
+  specified file revisions. Revisions never move between files, so results
+  are memoized for the life of the process.
+  """
+  client = get_client()
+  def fetch(rev_id: str) -> tuple[str, str]:
+    file = client.get_file_by_revision_id(rev_id)
+    return (file.resource_type, file.resource_id)
+
+  return resolve_concurrently(rev_ids,
+                              fetch,
+                              _revision_resource_memo)
+
+
+def get_file_resources(file_ids: list[str]) -> dict[str, tuple[str, str]]:
+  """
+  Returns the (resource type, resource ID) of each of the specified files.
+  A file never changes the resource it belongs to, so results are memoized for
+  the life of the process.
+  """
+  client = get_client()
+  def fetch(file_id: str) -> tuple[str, str]:
+    file = client.get_file(file_id)
+    return (file.resource_type, file.resource_id)
+
+  return resolve_concurrently(file_ids,
+                              fetch,
+                              _file_resource_memo)
+
+
+def get_user_display_names(user_ids: list[str]) -> dict[str, str]:
+  client = get_client()
+  def fetch(user_id: str) -> str:
+    return client.get_user_by_id(user_id).display_name
+
+  return resolve_concurrently(user_ids,
+                              fetch,
+                              _user_name_memo)
 
 
 def get_model_display_name(model_id: str) -> str:
@@ -64,40 +546,146 @@ def get_model_display_name(model_id: str) -> str:
 
   return disp_name
 
-def get_latest_revision(model_id: str) -> str:
+def get_latest_revision(model_id: str) -> FileRevision:
+  """
+  Returns the latest revision of the model, i.e. the last entry of its
+  revision list.
+
+  The result is cached per model for LATEST_REVISION_TTL seconds. Revisions
+  observed by watch_models or uploaded with update_model_file replace the
+  cached entry immediately, so the registry is only asked again once the
+  entry expires. A revision uploaded by another client may therefore be seen
+  up to LATEST_REVISION_TTL seconds late; callers that find nothing for the
+  cached revision should invalidate it and ask again (see
+  find_artifact_revision).
+  """
+  with _memo_lock:
+    entry = _latest_revision_memo.get(model_id)
+  if entry is not None:
+    latest_rev, expires = entry
+    if monotonic() < expires:
+      return latest_rev
+
   client = get_client()
   mod = client.get_model(model_id)
-  mod_revs = mod.file.revisions
-  ret_rev = None
-  for mod_rev in mod_revs:
-    if ret_rev == None or ret_rev.created < mod_rev.created:
-      ret_rev = mod_rev
+  latest_rev = mod.file.revisions[-1]
+  _remember_latest_revision(model_id,
+                            latest_rev)
+  return latest_rev
+
+
+def _remember_latest_revision(model_id: str,
+                              latest_rev: FileRevision) -> None:
+  with _memo_lock:
+    _latest_revision_memo[model_id] = (latest_rev, monotonic() + LATEST_REVISION_TTL)
+
+
+def invalidate_latest_revision(model_id: str) -> None:
+  with _memo_lock:
+    _latest_revision_memo.pop(model_id, None)
 
-  return ret_rev.id
-  
 
-def wait_for_new_version(model_id: str) -> Model:
+def update_model_file(model_id: str,
+                      model_file: str,
+                      **kwargs) -> Model:
+  """
+  Uploads model_file as a new revision of the model and records it as the
+  model's latest revision.
+  """
   client = get_client()
-  empty_str = ' ' * 64
-  mod = client.get_model(model_id)
-  revs = mod.file.revisions
-  mod_name = revs[0].display_name
-  latest_rev = revs[-1]
-  rev_count = len(revs)
-  while True:
-    print(empty_str, end="\r")
-    print(f"Polling for model updates: {mod_name}",
-          end="\r")
-    sleep(5)
-    mod = client.get_model(model_id)
-    revs = mod.file.revisions
-    new_rev_count = len(revs)
-    if new_rev_count != rev_count:
-      latest_rev = revs[-1]
-      break
+  invalidate_latest_revision(model_id)
+  mod = client.update_model(model_id,
+                            model_file,
+                            **kwargs)
+  _remember_latest_revision(model_id,
+                            mod.file.revisions[-1])
+  return mod
+
+
+def fetch_latest_revisions(model_ids: list[str]) -> list[FileRevision]:
+  """
+  Fetches the models concurrently (at most LOOKUP_WORKERS requests at once)
+  and returns their latest revisions in the order of model_ids, recording
+  each as the model's latest revision.
+  """
+  client = get_client()
+  max_workers = max(1, min(LOOKUP_WORKERS, len(model_ids)))
+  with ThreadPoolExecutor(max_workers = max_workers) as pool:
+    mods = list(pool.map(client.get_model, model_ids))
 
-  print(empty_str, end="\r")
-  print(f"Model update detected: {mod_name}")
+  latest_revs = []
+  for mod_id, mod in zip(model_ids, mods):
+    latest_rev = mod.file.revisions[-1]
+    _remember_latest_revision(mod_id,
+                              latest_rev)
+    latest_revs.append(latest_rev)
+
+  return latest_revs
+
+
+def watch_models(model_ids: list[str],
+                 timeout: float = MODEL_WAIT_TIMEOUT,
+                 cancel_event: threading.Event = None,
+                 show_status: bool = True) -> Iterator[tuple[str, FileRevision]]:
+  """
+  Watches a set of models in a single polling loop and yields
+  (model ID, new latest revision) for each model as soon as a revision newer
+  than the one present when watching started is uploaded.
+
+  Every poll round fetches the pending models with fetch_latest_revisions and
+  compares their latest revision ID with the baseline. Models that have changed are no longer polled.
+
+  Throws TimeoutError if any model has not changed within timeout seconds
+  (a timeout of 0 or None waits indefinitely). If cancel_event is set,
+  watching stops and the unchanged models are not yielded. Status output is
+  suppressed when show_status is False (e.g. when called from a tool on a
+  stdio server).
+  """
+  pending = list(dict.fromkeys(model_ids))
+  model_count = len(pending)
+  deadline = None
+  if timeout:
+    deadline = monotonic() + timeout
+
+  baseline = {mod_id: latest_rev.id
+              for mod_id, latest_rev in zip(pending, fetch_latest_revisions(pending))}
+  while len(pending) > 0:
+    delay = MODEL_POLL_INTERVAL
+    if deadline is not None:
+      remaining = deadline - monotonic()
+      if remaining <= 0:
+        raise TimeoutError(f"{len(pending)} of {model_count} models did not change within {timeout} seconds: {pending}")
+      delay = min(delay, remaining)
+
+    if show_status: print(f"Polling for model updates: {len(pending)}/{model_count}", end="\r")
+    if cancel_event is not None:
+      if cancel_event.wait(delay): break
+    else:
+      sleep(delay)
+
+    still_pending = []
+    for mod_id, latest_rev in zip(pending, fetch_latest_revisions(pending)):
+      if latest_rev.id != baseline[mod_id]:
+        if show_status:
+          print(' ' * 64, end="\r")
+          print(f"Model update detected: {latest_rev.display_name}")
+        yield (mod_id, latest_rev)
+      else:
+        still_pending.append(mod_id)
+    pending = still_pending
+
+  if show_status: print(' ' * 64, end="\r")
+
+
+def wait_for_new_version(model_id: str,
+                         timeout: float = MODEL_WAIT_TIMEOUT) -> FileRevision:
+  """
+  Waits for a new revision of the model to be uploaded and returns it.
+
+  Throws TimeoutError if no new revision appears within timeout seconds.
+  """
+  _,latest_rev = next(watch_models([model_id],
+                                   timeout))
   return latest_rev
 
 
@@ -131,51 +719,251 @@ def download_artifact_orig(model_id: str,
       fout.write(art.read_bytes())
 
 
-def download_artifact_data(model_id: str,
-                           artifact_name: str) -> bytes:
+def _scan_model_artifacts(model_id: str,
+                          index: dict) -> None:
   client = get_client()
-  mod = client.get_model(model_id)
-  mod_rev_id = mod.file.revisions[-1].id
+  arts = list_all_pages(client.list_model_artifacts,
+                        model_id)
+  # Several revisions (of one or more artifacts with the same name) can be
+  # generated from the same model revision, e.g. when results are extracted
+  # again; keep the newest, as reported by the artifact listing
+  for art in arts:
+    for art_rev in art.revisions:
+      for art_rev_src in art_rev.sources:
+        key = (art.name, art_rev_src.revision_id)
+        entry = index.get(key)
+        if entry is None or art_rev.created >= entry[1].created:
+          index[key] = (art, art_rev)
+
+
+def find_artifact_revision(model_id: str,
+                           artifact_name: str,
+                           model_rev_id: str = None) -> FileRevision:
+  """
+  Returns the newest revision of the named artifact that was generated by the
+  given revision of the model (the latest model revision if not specified).
 
-  pg_idx = 1
-  while True:
-    art_list = client.list_model_artifacts(model_id,
-                                           page = pg_idx)
-    arts = art_list.items
-    if len(arts) == 0:
-      break
-    
-    # Find artifact with name matching artifact_name and generated by the latest
-    # version of the model
-    for art in arts:
-      if art.name == artifact_name:
-        for art_rev in art.revisions:
-          for art_rev_src in art_rev.sources:
-            try:
-              if art_rev_src.revision_id == mod_rev_id:
-                return art_rev.read_bytes()
-            except Exception as excp:
-              print(f"Exception: {excp}")
+  Artifact revisions are looked up in a per-model index keyed by
+  (artifact name, model revision ID). The index is built on first use and is
+  rescanned only when a lookup misses, e.g. after new artifacts were extracted.
+  When the latest model revision is taken from the get_latest_revision cache
+  and no artifact is found for it, the model is fetched again and the lookup
+  is retried once for its actual latest revision.
 
-    pg_idx += 1
+  Throws FileNotFoundError if the artifact is not found.
+  """
+  if model_rev_id is not None:
+    entry = _lookup_artifact(model_id,
+                             (artifact_name, model_rev_id))
+  else:
+    latest_rev_id = get_latest_revision(model_id).id
+    entry = _lookup_artifact(model_id,
+                             (artifact_name, latest_rev_id))
+    if entry is None:
+      invalidate_latest_revision(model_id)
+      fresh_rev_id = get_latest_revision(model_id).id
+      if fresh_rev_id != latest_rev_id:
+        entry = _lookup_artifact(model_id,
+                                 (artifact_name, fresh_rev_id))
+
+  if entry is None:
+    raise FileNotFoundError(f"Artifact not found: {artifact_name}")
+
+  _,art_rev = entry
+  return art_rev
+
+
+def _lookup_artifact(model_id: str,
+                     key: tuple[str, str]) -> tuple[Artifact, FileRevision]:
+  with _artifact_index_lock:
+    index = _artifact_index.setdefault(model_id, {})
+    model_lock = _artifact_index_model_locks.setdefault(model_id, threading.Lock())
+  entry = index.get(key)
+  if entry is None:
+    with model_lock:
+      entry = index.get(key)
+      if entry is None:
+        _scan_model_artifacts(model_id,
+                              index)
+        entry = index.get(key)
+
+  return entry
+
+
+def invalidate_artifact_index(model_id: str) -> None:
+  with _artifact_index_lock:
+    _artifact_index.pop(model_id, None)
+
+
+def get_model_artifact_revisions(model_id: str,
+                                 model_rev_id: str) -> list[tuple[Artifact, FileRevision]]:
+  """
+  Returns the (artifact, newest artifact revision) pairs generated by the given
+  model revision, refreshing the model's artifact index first.
+  """
+  with _artifact_index_lock:
+    index = _artifact_index.setdefault(model_id, {})
+    model_lock = _artifact_index_model_locks.setdefault(model_id, threading.Lock())
+  with model_lock:
+    _scan_model_artifacts(model_id,
+                          index)
+    return [entry for (_,rev_id), entry in index.items()
+            if rev_id == model_rev_id]
+
+
+def reference_token(token: Token,
+                    created: datetime) -> Token:
+  """
+  Returns a new token pointing at the same stored object as an existing one.
+  """
+  return istari_digital_client.Token(id = str(uuid.uuid4()),
+                                     created = created,
+                                     sha = token.sha,
+                                     salt = token.salt)
+
+
+def reference_revision(file_rev: FileRevision) -> FileRevision:
+  """
+  Returns a new, unregistered file revision that refers to the stored contents
+  of an existing revision. Registry storage is content addressed, so the new
+  revision (with fresh content and properties tokens carrying the same sha and
+  salt) can be registered as a model or artifact without transferring the
+  contents again.
+  """
+  rev_id = str(uuid.uuid4())
+  now = datetime.now(timezone.utc)
+  archive_status = istari_digital_client.FileRevisionArchiveStatus(
+      id = str(uuid.uuid4()),
+      created = now,
+      name = istari_digital_client.ArchiveStatusName.ACTIVE,
+      reason = 'Initial',
+      created_by_id = None,
+      file_revision_id = rev_id)
+  return file_rev.model_copy(update = {"id": rev_id,
+                                       "created": now,
+                                       "file_id": None,
+                                       "content_token": reference_token(file_rev.content_token,
+                                                                        now),
+                                       "properties_token": reference_token(file_rev.properties_token,
+                                                                           now),
+                                       "archive_status_history": [archive_status],
+                                       "sources": [],
+                                       "products": None,
+                                       "created_by_id": None})
+
+
+def add_model_by_reference(file_rev: FileRevision) -> Model:
+  """
+  Creates a new model from an existing file revision (e.g. an artifact)
+  without downloading and re-uploading its contents.
+  """
+  client = get_client()
+  return client._create_model(file_revision = reference_revision(file_rev))
+
+
+def add_artifact_by_reference(model_id: str,
+                              file_rev: FileRevision) -> Artifact:
+  """
+  Adds an existing file revision to a model as a new artifact without
+  downloading and re-uploading its contents.
+  """
+  client = get_client()
+  return client._create_artifact(model_id = model_id,
+                                 file_revision = reference_revision(file_rev))
+
+
+def add_model_by_copy(model_id: str,
+                      artifact_name: str) -> Model:
+  """
+  Creates a new model from an artifact of the latest version of a model by
+  downloading the artifact and uploading it again. Used where
+  add_model_by_reference is rejected by the registry.
+  """
+  client = get_client()
+  art_dir = tempfile.mkdtemp()
+  try:
+    art_file = os.path.join(art_dir,
+                            artifact_name)
+    download_artifact(model_id,
+                      artifact_name,
+                      art_file)
+    return client.add_model(art_file)
+  finally:
+    shutil.rmtree(art_dir,
+                  ignore_errors = True)
+
+
+def add_artifact_by_copy(model_id: str,
+                         src_model_id: str,
+                         artifact_name: str) -> Artifact:
+  """
+  Adds an artifact of the latest version of src_model_id to a model by
+  downloading the artifact and uploading it again. Used where
+  add_artifact_by_reference is rejected by the registry.
+  """
+  client = get_client()
+  art_dir = tempfile.mkdtemp()
+  try:
+    art_file = os.path.join(art_dir,
+                            artifact_name)
+    download_artifact(src_model_id,
+                      artifact_name,
+                      art_file)
+    return client.add_artifact(model_id,
+                               art_file)
+  finally:
+    shutil.rmtree(art_dir,
+                  ignore_errors = True)
 
-  raise FileNotFoundError(f"Artifact not found: {artifact_name}")
+
+def download_artifact_data(model_id: str,
+                           artifact_name: str) -> bytes:
+  art_rev = find_artifact_revision(model_id,
+                                   artifact_name)
+  if artifact_cache is None:
+    return art_rev.read_bytes()
+
+  return artifact_cache.read(art_rev)
 
 
 def download_artifact(model_id: str,
                       artifact_name: str,
-                      dest_file: str = None) -> None:
+                      dest_file: str = None,
+                      progress: Callable[[int, int], None] = None) -> None:
   """
   Downloads the artifact associated with the latest version of the model.
 
+  The artifact is written to disk in DOWNLOAD_CHUNK_SIZE blocks; if it is
+  already in the local artifact cache it is streamed from there without being
+  loaded into memory. Artifacts larger than ARTIFACT_CACHE_MAX_ENTRY_SIZE are
+  not added to the cache. progress, if given, is called with the number of
+  bytes written so far and the total size.
+
   Throws FileNotFoundError if the artifact is not found.
   """
-  art_bytes = download_artifact_data(model_id,
-                                     artifact_name)
   if dest_file is None:
     dest_file = artifact_name
-  with open(dest_file, 'wb') as fout:
-    fout.write(art_bytes)
+
+  art_rev = find_artifact_revision(model_id,
+                                   artifact_name)
+  if artifact_cache is not None:
+    if artifact_cache.copy_to(art_rev,
+                              dest_file,
+                              DOWNLOAD_CHUNK_SIZE,
+                              progress):
+      return
+
+  art_bytes = art_rev.read_bytes()
+  art_view = memoryview(art_bytes)
+  write_chunks((art_view[idx:idx + DOWNLOAD_CHUNK_SIZE]
+                for idx in range(0, len(art_view), DOWNLOAD_CHUNK_SIZE)),
+               dest_file,
+               len(art_view),
+               progress)
+
+  if artifact_cache is not None:
+    artifact_cache.put(art_rev,
+                       art_bytes)
 
 
 def get_input(msg: str,
@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+  """
+  Returns the named module without executing it. The module is loaded the
+  first time one of its attributes is accessed, so a dependency that is only
+  needed by some tools is not paid for at server startup.
+
+  Before Python 3.12 the deferred load is not thread-safe; the first
+  attribute access should happen under a lock (see get_client).
+  """
+  module = sys.modules.get(name)
+  if module is not None:
+    return module
+
+  spec = importlib.util.find_spec(name)
+  if spec is None:
+    raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+  loader = importlib.util.LazyLoader(spec.loader)
+  spec.loader = loader
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[name] = module
+  loader.exec_module(module)
+  return module
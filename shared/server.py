@@ -0,0 +1,18 @@
+from mcp.server.fastmcp import FastMCP
+
+
+_server = None
+
+def get_server() -> FastMCP:
+  """
+  Returns the process-wide FastMCP server.
+
+  Every tool family registers its tools on this instance, so a process that
+  loads several families (see istari-server.py) serves all of their tools from
+  one server, while each istari-<family>.py script still runs on its own.
+  """
+  global _server
+  if _server is None:
+    _server = FastMCP("istari-mcp-server")
+
+  return _server
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Hashable
+
+
+class TTLCache:
+  """
+  Thread-safe in-memory cache whose entries expire ttl seconds after they
+  were stored. Once max_size entries are held, the least recently used entry
+  is evicted.
+  """
+
+  def __init__(self,
+               ttl: float,
+               max_size: int):
+    self.ttl = ttl
+    self.max_size = max_size
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+
+  def get(self,
+          key: Hashable) -> object:
+    """
+    Returns the cached value, or None on a miss or if the entry has expired.
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+
+      value, expires = entry
+      if monotonic() >= expires:
+        del self._entries[key]
+        return None
+
+      self._entries.move_to_end(key)
+      return value
+
+
+  def put(self,
+          key: Hashable,
+          value: object) -> None:
+    if self.ttl <= 0 or self.max_size <= 0:
+      return
+
+    with self._lock:
+      self._entries[key] = (value, monotonic() + self.ttl)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_size:
+        self._entries.popitem(last=False)
+
+
+  def get_or_fetch(self,
+                   key: Hashable,
+                   fetch: Callable[[], object]) -> object:
+    """
+    Returns the cached value, calling fetch and caching its result on a miss.
+    """
+    value = self.get(key)
+    if value is None:
+      value = fetch()
+      self.put(key, value)
+
+    return value
+
+
+  def invalidate(self,
+                 key: Hashable) -> None:
+    with self._lock:
+      self._entries.pop(key, None)
+
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
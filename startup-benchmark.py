@@ -0,0 +1,93 @@
+"""
+Measures the cold-start time of the MCP server scripts.
+
+Each script is started in a fresh interpreter with -X importtime and loaded up
+to the point where its tools are registered (for istari-server.py, every
+family in TOOL_FAMILIES is loaded). The report lists the total start time of
+each script and the top-level packages that took longest to import, and flags
+scripts that exceed the startup budget.
+
+Usage: python startup-benchmark.py [script ...] [--budget MS] [--top N]
+"""
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+from time import perf_counter
+
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '1500'))
+
+LOAD_SCRIPT = """
+import runpy, sys
+ns = runpy.run_path(sys.argv[1], run_name='startup_benchmark')
+if 'load_tool_family' in ns:
+  from shared.constants import TOOL_FAMILIES
+  for family in TOOL_FAMILIES:
+    ns['load_tool_family'](family)
+"""
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(script: str) -> tuple[float, dict[str, float]]:
+  """
+  Starts the script in a fresh interpreter and returns its start time and
+  the import time of each top-level package (the time spent executing its
+  own modules, excluding the packages they import), both in milliseconds.
+  """
+  start = perf_counter()
+  proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', LOAD_SCRIPT, script],
+                        capture_output = True,
+                        text = True,
+                        cwd = os.path.dirname(os.path.abspath(__file__)))
+  elapsed = (perf_counter() - start) * 1000
+  if proc.returncode != 0:
+    raise RuntimeError(f"{script} failed to start:\n{proc.stderr[-2000:]}")
+
+  packages = {}
+  for line in proc.stderr.splitlines():
+    match = IMPORT_TIME_LINE.match(line)
+    if match is None:
+      continue
+    self_us,_,_,module = match.groups()
+    package = module.split('.')[0]
+    packages[package] = packages.get(package, 0) + int(self_us) / 1000
+
+  return elapsed, packages
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description = 'Measure MCP server start times')
+  parser.add_argument('scripts', nargs = '*')
+  parser.add_argument('--budget', type = float, default = STARTUP_BUDGET_MS,
+                      help = 'Startup budget per script in milliseconds')
+  parser.add_argument('--top', type = int, default = 8,
+                      help = 'Number of slowest packages to list per script')
+  args = parser.parse_args()
+
+  base_dir = os.path.dirname(os.path.abspath(__file__))
+  scripts = args.scripts
+  if len(scripts) == 0:
+    scripts = sorted(os.path.basename(path) for path in glob.glob(os.path.join(base_dir, 'istari-*.py')))
+
+  over_budget = []
+  for script in scripts:
+    elapsed, packages = measure(script)
+    status = 'OK'
+    if elapsed > args.budget:
+      status = 'OVER BUDGET'
+      over_budget.append(script)
+
+    print(f"{script}: {elapsed:.0f} ms [{status}]")
+    slowest = sorted(packages.items(), key = lambda item: item[1], reverse = True)
+    for package, import_ms in slowest[:args.top]:
+      print(f"  {package:<32} {import_ms:8.1f} ms")
+
+  print(f"Budget: {args.budget:.0f} ms, {len(scripts) - len(over_budget)}/{len(scripts)} scripts within budget")
+  return 1 if len(over_budget) > 0 else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())